@@ -1,31 +1,170 @@
 # functions/math_tools.py
+import logging
+import operator
+from typing import List, Optional, Union
+
+# numpy is optional: math_batch uses its vectorized ufuncs when installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = logging.getLogger(__name__)
+
+Numbers = Union[float, List[float]]
+
+_BINARY_OPS = {
+    "add": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+    "divide": operator.truediv,
+}
+_UNARY_OPS = {
+    "square": lambda x: x ** 2,
+    "cube": lambda x: x ** 3,
+}
+if np is not None:
+    _NP_BINARY_OPS = {"add": np.add, "subtract": np.subtract, "multiply": np.multiply, "divide": np.true_divide}
+    _NP_UNARY_OPS = {"square": np.square, "cube": lambda x: np.power(x, 3)}
+
+def _is_batch(value) -> bool:
+    return isinstance(value, (list, tuple)) or (np is not None and isinstance(value, np.ndarray))
+
+def _float_only(value) -> bool:
+    """True if numpy gives the same result as plain Python for this operand, i.e. it holds only floats."""
+    if value is None:
+        return True
+    if isinstance(value, np.ndarray):
+        return value.dtype.kind == "f"
+    if isinstance(value, (list, tuple)):
+        return all(type(x) is float for x in value)
+    return type(value) is float
+
+def math_batch(op: str, a: List[float], b: Optional[Numbers] = None) -> List[float]:
+    """
+    Applies one arithmetic operation element-wise to lists of numbers in a single call.
+    Prefer this over many separate calls when the same operation is needed for several values.
+
+    Args:
+        op: The operation: "add", "subtract", "multiply", "divide", "square" or "cube".
+        a: The first operands.
+        b: The second operands for add, subtract, multiply and divide
+           (a single number is applied to every element of a).
+
+    Returns:
+        The list of results, one per element of a.
+    """
+    # numpy computes in float64 (or fixed-width ints that overflow), so operands holding Python
+    # ints take the plain path; the results then do not depend on whether numpy is installed
+    vectorize = np is not None and _float_only(a) and _float_only(b)
+    if op in _UNARY_OPS:
+        if vectorize:
+            result = _NP_UNARY_OPS[op](np.asarray(a, dtype=float)).tolist()
+        else:
+            func = _UNARY_OPS[op]
+            result = [func(x) for x in a]
+    elif op in _BINARY_OPS:
+        if b is None:
+            raise ValueError(f"Operation '{op}' needs a second operand b.")
+        if vectorize:
+            with np.errstate(divide="raise", invalid="raise"):
+                result = _NP_BINARY_OPS[op](np.asarray(a, dtype=float), np.asarray(b, dtype=float)).tolist()
+        else:
+            func = _BINARY_OPS[op]
+            if _is_batch(b):
+                if len(a) != len(b):
+                    raise ValueError("a and b must have the same length.")
+                result = [func(x, y) for x, y in zip(a, b)]
+            else:
+                result = [func(x, b) for x in a]
+    else:
+        raise ValueError(f"Unknown operation '{op}'.")
+
+    log.debug("Batch %s over %s values = %s", op, len(result), result)
+    return result
 
 def subtract_numbers(a: float, b: float) -> float:
     """Subtracts b from a and returns the result."""
-    print(f"Subtracting {a} and {b} = {a - b}")
-    return a - b
+    if _is_batch(a) or _is_batch(b):
+        return math_batch("subtract", a if _is_batch(a) else [a] * len(b), b)
+    result = a - b
+    log.debug("Subtracting %s and %s = %s", a, b, result)
+    return result
 
 def add_numbers(a: float, b: float) -> float:
     """Adds two numbers and returns the result."""
-    print(f"Adding {a} and {b} = {a + b}")
-    return a + b
+    if _is_batch(a) or _is_batch(b):
+        return math_batch("add", a if _is_batch(a) else [a] * len(b), b)
+    result = a + b
+    log.debug("Adding %s and %s = %s", a, b, result)
+    return result
 
 def multiply_numbers(a: float, b: float) -> float:
     """Multiplies two numbers and returns the result."""
-    print(f"Multiplying {a} and {b} = {a * b}")
-    return a * b
+    if _is_batch(a) or _is_batch(b):
+        return math_batch("multiply", a if _is_batch(a) else [a] * len(b), b)
+    result = a * b
+    log.debug("Multiplying %s and %s = %s", a, b, result)
+    return result
 
 def divide_numbers(a: float, b: float) -> float:
     """Divides a by b and returns the result."""
-    print(f"Dividing {a} and {b} = {a / b}")
-    return a / b
+    if _is_batch(a) or _is_batch(b):
+        return math_batch("divide", a if _is_batch(a) else [a] * len(b), b)
+    result = a / b
+    log.debug("Dividing %s and %s = %s", a, b, result)
+    return result
 
 def square_number(a: float) -> float:
     """Squares a number and returns the result."""
-    print(f"Squaring {a} = {a ** 2}")
-    return a ** 2
+    if _is_batch(a):
+        return math_batch("square", a)
+    result = a ** 2
+    log.debug("Squaring %s = %s", a, result)
+    return result
 
 def cube_number(a: float) -> float:
     """Cubes a number and returns the result."""
-    print(f"Cubing {a} = {a ** 3}")
-    return a ** 3
\ No newline at end of file
+    if _is_batch(a):
+        return math_batch("cube", a)
+    result = a ** 3
+    log.debug("Cubing %s = %s", a, result)
+    return result
+
+def _check_scalars(inputs: List[dict], *names: str):
+    # A call that already passes lists would be nested into the batch; raising makes
+    # LLMHandler run the group one call at a time instead
+    if any(_is_batch(i[name]) for i in inputs for name in names):
+        raise ValueError("Batched calls take scalar arguments only.")
+
+def _batch_binary(op: str):
+    """
+    Batch implementation of a two-operand tool. Calls that pass lists are not batched:
+
+    >>> _batch_binary("add")([{"a": 1, "b": 2}, {"a": 5, "b": 6}])
+    [3, 11]
+    >>> _batch_binary("add")([{"a": [1, 2], "b": [3, 4]}, {"a": 5, "b": 6}])
+    Traceback (most recent call last):
+    ValueError: Batched calls take scalar arguments only.
+    """
+    def run(inputs: List[dict]) -> List[float]:
+        _check_scalars(inputs, "a", "b")
+        return math_batch(op, [i["a"] for i in inputs], [i["b"] for i in inputs])
+    return run
+
+def _batch_unary(op: str):
+    def run(inputs: List[dict]) -> List[float]:
+        _check_scalars(inputs, "a")
+        return math_batch(op, [i["a"] for i in inputs])
+    return run
+
+# Batch implementations of the scalar tools, for LLMHandler.register_batch_functions:
+# each takes the list of call arguments and returns one result per call
+BATCH_FUNCTIONS = {
+    "subtract_numbers": _batch_binary("subtract"),
+    "add_numbers": _batch_binary("add"),
+    "multiply_numbers": _batch_binary("multiply"),
+    "divide_numbers": _batch_binary("divide"),
+    "square_number": _batch_unary("square"),
+    "cube_number": _batch_unary("cube"),
+}
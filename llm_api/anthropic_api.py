@@ -1,53 +1,76 @@
 # llm_api/anthropic_api.py
 import os
-from typing import List, Dict
-from anthropic import Anthropic
-from llm_api.base_api import BaseLLMAPI
+from typing import List, Dict, Iterator, Optional
+from anthropic import Anthropic, AsyncAnthropic
+from llm_api.base_api import BaseLLMAPI, cached_generate, cached_agenerate, join_text_blocks
+from llm_api.batching import run_anthropic_batch
+
+# Roughly 1024 tokens, the smallest prefix Anthropic will cache
+PROMPT_CACHE_MIN_CHARS = 4096
 
 class AnthropicAPI(BaseLLMAPI):
     """
     Anthropic LLM API integration.
     """
-    def __init__(self, model_name: str = "claude-3-5-sonnet-20240620", VERBOSE=False, CONFIRMATION_PRINT=False):
+    def __init__(self, model_name: str = "claude-3-5-sonnet-20240620", VERBOSE=False, CONFIRMATION_PRINT=False, cache_size: int = 0, http_client=None,
+                 extra_headers: Optional[Dict[str, str]] = None, extra_body: Optional[Dict] = None):
+        """
+        :param extra_headers: Extra HTTP headers sent with every interactive request,
+                              e.g. {"anthropic-beta": "..."} to opt into a beta feature.
+        :param extra_body: Extra fields merged into every interactive request body, for
+                           parameters the installed SDK does not know about yet.
+        """
         self.model_name = model_name
         api_key = os.environ.get("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("No ANTHROPIC_API_KEY found.")
-        self.client = Anthropic(api_key=api_key)
+        self.client = Anthropic(api_key=api_key, http_client=http_client or self.shared_http_client())
+        self.aclient = AsyncAnthropic(api_key=api_key)
         self.VERBOSE = VERBOSE
         self.CONFIRMATION_PRINT = CONFIRMATION_PRINT
+        self.cache_size = cache_size
+        # Passed through the SDK's per-request options; the Message Batches API takes plain params only
+        self._request_options = {}
+        if extra_headers:
+            self._request_options["extra_headers"] = extra_headers
+        if extra_body:
+            self._request_options["extra_body"] = extra_body
+
+    def _convert_message(self, msg: Dict):
+        role = msg["role"]
+        text = join_text_blocks(msg["content"]).strip()
+
+        if role == "system":
+            return {"role":"system","content":text}
+
+        if role == "tool":
+            # Treat tool messages as user messages containing the tool result
+            tool_call_id = msg.get("tool_call_id")
+            if tool_call_id:
+                text_content = f"Tool result for {tool_call_id}: {text}"
+            else:
+                text_content = text
+            return {"role":"user","content":text_content}
+
+        # For user/assistant normal messages
+        if text:
+            return {"role":role,"content":text}
+        return None
 
     def _convert_messages(self, messages: List[Dict]):
         system_prompt = ""
         normal_msgs = []
-        for msg in messages:
-            role = msg["role"]
-            cblocks = msg["content"]
-
-            if role == "system":
-                stext = " ".join(b.get("text","") for b in cblocks if b["type"]=="text").strip()
-                system_prompt = stext
+        for converted in self._convert_messages_cached(messages, self._convert_message):
+            if converted is None:
                 continue
-
-            if role == "tool":
-                # Treat tool messages as user messages containing the tool result
-                txt = " ".join(b.get("text","") for b in cblocks if b["type"]=="text").strip()
-                tool_call_id = msg.get("tool_call_id")
-                if tool_call_id:
-                    text_content = f"Tool result for {tool_call_id}: {txt}"
-                else:
-                    text_content = txt
-                normal_msgs.append({"role":"user","content":text_content})
+            if converted["role"] == "system":
+                system_prompt = converted["content"]
                 continue
-
-            # For user/assistant normal messages
-            msg_text = " ".join(b.get("text","") for b in cblocks if b["type"]=="text").strip()
-            if msg_text:
-                normal_msgs.append({"role":role,"content":msg_text})
+            normal_msgs.append(converted)
 
         return system_prompt, normal_msgs
 
-    def generate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+    def _build_params(self, messages: List[Dict], tools: List[Dict]) -> Dict:
         system_prompt, anthropic_messages = self._convert_messages(messages)
         params = {
             "model": self.model_name,
@@ -60,12 +83,16 @@ class AnthropicAPI(BaseLLMAPI):
         if tools:
             params["tools"] = tools
 
-        response = self.client.messages.create(**params)
-        if self.VERBOSE:
-            print("Anthropic raw api response:", response)
-        if self.CONFIRMATION_PRINT:
-            print("ANTHROPIC RESPONSE RECEIVED")
+        # Mark the static prefix (tools + system prompt) for Anthropic prompt caching so the
+        # server can reuse it across turns. Short prefixes are below the cacheable minimum.
+        if len(system_prompt) + len(self._serialized_tools(tools)) > PROMPT_CACHE_MIN_CHARS:
+            if system_prompt:
+                params["system"] = [{"type":"text","text":system_prompt,"cache_control":{"type":"ephemeral"}}]
+            if tools:
+                params["tools"] = tools[:-1] + [{**tools[-1], "cache_control":{"type":"ephemeral"}}]
+        return params
 
+    def _parse_response(self, response) -> Dict:
         content_blocks = []
         has_tool_calls = False
 
@@ -84,4 +111,54 @@ class AnthropicAPI(BaseLLMAPI):
         return {
             "content": content_blocks,
             "stop_reason": "tool_use" if has_tool_calls else "stop_sequence"
-        }   
\ No newline at end of file
+        }
+
+    @cached_generate
+    def generate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        response = self.client.messages.create(**self._build_params(messages, tools), **self._request_options)
+        if self.VERBOSE:
+            print("Anthropic raw api response:", response)
+        if self.CONFIRMATION_PRINT:
+            print("ANTHROPIC RESPONSE RECEIVED")
+
+        return self._parse_response(response)
+
+    @cached_agenerate
+    async def agenerate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        response = await self.aclient.messages.create(**self._build_params(messages, tools), **self._request_options)
+        if self.VERBOSE:
+            print("Anthropic raw api response:", response)
+        if self.CONFIRMATION_PRINT:
+            print("ANTHROPIC RESPONSE RECEIVED")
+
+        return self._parse_response(response)
+
+    def generate_stream(self, messages: List[Dict], tools: List[Dict]) -> Iterator[Dict]:
+        with self.client.messages.stream(**self._build_params(messages, tools), **self._request_options) as stream:
+            for event in stream:
+                if event.type == "text":
+                    yield {"type":"text_delta","text":event.text}
+                elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                    block = event.content_block
+                    yield {"type":"tool_use","id":block.id,"name":block.name,"input":block.input}
+            response = stream.get_final_message()
+
+        if self.VERBOSE:
+            print("Anthropic raw api response:", response)
+        if self.CONFIRMATION_PRINT:
+            print("ANTHROPIC RESPONSE RECEIVED")
+        yield {"type":"response","response":self._parse_response(response)}
+
+    def generate_batch(self, conversations: List[List[Dict]], tools: List[Dict]) -> List[Dict]:
+        """
+        Submit all conversations through the Anthropic Message Batches API (about half the
+        price of interactive calls, up to 24h turnaround) and return one response per conversation.
+        """
+        params_list = [self._build_params(messages, tools) for messages in conversations]
+        results = run_anthropic_batch(self.client, params_list)
+        if self.VERBOSE:
+            print("Anthropic raw batch results:", results)
+        if self.CONFIRMATION_PRINT:
+            print("ANTHROPIC BATCH RESULTS RECEIVED")
+
+        return [self._parse_response(message) for message in results]
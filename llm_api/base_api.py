@@ -1,19 +1,364 @@
 # llm_api/base_api.py
+import asyncio
+import atexit
+import copy
+import functools
+import hashlib
+import importlib.util
+import threading
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from collections import OrderedDict
+from typing import List, Dict, Optional, Callable, Iterator, Iterable
+from llm_api.json_utils import dumps, parse_tool_arguments
+
+
+def join_text_blocks(blocks: List[Dict]) -> str:
+    """
+    Join the text of all 'text' content blocks with spaces.
+    The single-block case (by far the most common) returns the text without building a join.
+    """
+    if len(blocks) == 1:
+        block = blocks[0]
+        return block.get("text", "") if block.get("type") == "text" else ""
+    return " ".join(b.get("text", "") for b in blocks if b.get("type") == "text")
+
+
+def to_openai_compat_message(msg: Dict) -> Dict:
+    """
+    Convert one message from the standardized format into the OpenAI chat format,
+    which Groq's OpenAI-compatible endpoint shares.
+    """
+    role = msg["role"]
+    if role == "tool":
+        # Tool messages
+        tool_call_id = msg.get("tool_call_id")
+        if not tool_call_id:
+            raise ValueError("Missing tool_call_id in tool message.")
+        text_content = join_text_blocks(msg["content"])
+        return {
+            "role":"tool",
+            "tool_call_id":tool_call_id,
+            "content": text_content
+        }
+
+    content_blocks = msg["content"]
+    text_parts = []
+    tool_calls = []
+    for block in content_blocks:
+        if not isinstance(block, dict):
+            # If by any chance a string slips through, convert to dict
+            block = {"type":"text","text":str(block)}
+        btype = block.get("type","text")
+        if btype == "text":
+            text_parts.append(block.get("text",""))
+        elif btype == "tool_use":
+            tool_calls.append({
+                "id": block["id"],
+                "type": "function",
+                "function": {
+                    "name": block["name"],
+                    "arguments": dumps(block["input"])
+                }
+            })
+        elif btype == "image":
+            text_parts.append("[Image data omitted]")
+
+    text_content = (text_parts[0] if len(text_parts) == 1 else " ".join(text_parts)).strip()
+
+    if role == "assistant" and tool_calls:
+        m = {"role": "assistant"}
+        if text_content:
+            m["content"] = text_content
+        m["tool_calls"] = tool_calls
+        return m
+
+    return {
+        "role": role,
+        "content": text_content if text_content else ""
+    }
+
+
+def iter_openai_compat_stream(chunks: Iterable) -> Iterator[Dict]:
+    """
+    Turn a streamed OpenAI-compatible chat completion (OpenAI and Groq) into stream events.
+    Tool call fragments are buffered by their index and each call is emitted as one complete
+    `tool_use` block once the choice finishes.
+    """
+    text_parts = []
+    calls = {}
+    tool_blocks = []
+    for chunk in chunks:
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if delta.content:
+            text_parts.append(delta.content)
+            yield {"type":"text_delta","text":delta.content}
+        for tc in delta.tool_calls or []:
+            call = calls.setdefault(tc.index, {"id": None, "name": "", "arguments": []})
+            if tc.id:
+                call["id"] = tc.id
+            if tc.function:
+                if tc.function.name:
+                    call["name"] = tc.function.name
+                if tc.function.arguments:
+                    call["arguments"].append(tc.function.arguments)
+        if choice.finish_reason and calls:
+            for index in sorted(calls):
+                call = calls[index]
+                block = {
+                    "type": "tool_use",
+                    "id": call["id"],
+                    "name": call["name"],
+                    "input": parse_tool_arguments("".join(call["arguments"]))
+                }
+                tool_blocks.append(block)
+                yield block
+            calls = {}
+
+    if tool_blocks:
+        response = {"content": tool_blocks, "stop_reason": "tool_use"}
+    else:
+        response = {"content": [{"type":"text","text":"".join(text_parts)}], "stop_reason": "stop_sequence"}
+    yield {"type":"response","response":response}
+
+
+def cached_generate(generate: Callable) -> Callable:
+    """
+    Decorator for `generate()` implementations that serves repeated requests from the
+    instance's response cache instead of calling the provider again.
+    The cache is disabled unless the instance has a positive `cache_size`.
+    """
+    @functools.wraps(generate)
+    def wrapper(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        if self.cache_size <= 0:
+            return generate(self, messages, tools)
+
+        key = self._cache_key(messages, tools)
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            if self.CONFIRMATION_PRINT:
+                print(f"{type(self).__name__} RESPONSE SERVED FROM CACHE")
+            return cached
+
+        response = generate(self, messages, tools)
+        self._cache_store(key, response)
+        return response
+
+    return wrapper
+
+
+def cached_agenerate(agenerate: Callable) -> Callable:
+    """
+    Async counterpart of `cached_generate`. Besides serving hits from the response cache,
+    concurrent calls with an identical request are coalesced: only the first one reaches the
+    provider and the others await its result, even if the first caller is cancelled.
+
+    >>> class Slow:
+    ...     cache_size, CONFIRMATION_PRINT = 0, False
+    ...     _cache_key = lambda self, messages, tools: "key"
+    ...     @cached_agenerate
+    ...     async def agenerate(self, messages, tools):
+    ...         await asyncio.sleep(0.01)
+    ...         return {"content": []}
+    >>> async def cancel_first():
+    ...     api = Slow()
+    ...     first = asyncio.ensure_future(api.agenerate([], []))
+    ...     await asyncio.sleep(0)
+    ...     second = asyncio.ensure_future(api.agenerate([], []))
+    ...     await asyncio.sleep(0)
+    ...     first.cancel()
+    ...     return await second
+    >>> asyncio.run(cancel_first())
+    {'content': []}
+    """
+    @functools.wraps(agenerate)
+    async def wrapper(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        key = self._cache_key(messages, tools)
+        if self.cache_size > 0:
+            cached = self._cache_lookup(key)
+            if cached is not None:
+                if self.CONFIRMATION_PRINT:
+                    print(f"{type(self).__name__} RESPONSE SERVED FROM CACHE")
+                return cached
+
+        in_flight = getattr(self, "_in_flight", None)
+        if in_flight is None:
+            in_flight = self._in_flight = {}
+        task = in_flight.get(key)
+        if task is not None:
+            return copy.deepcopy(await asyncio.shield(task))
+
+        async def call() -> Dict:
+            try:
+                response = await agenerate(self, messages, tools)
+            finally:
+                in_flight.pop(key, None)
+            if self.cache_size > 0:
+                self._cache_store(key, response)
+            return response
+
+        # The provider call runs as its own task, so cancelling the caller that started it
+        # does not cancel the callers coalesced onto it
+        task = in_flight[key] = asyncio.ensure_future(call())
+        # Mark the outcome as retrieved in case every caller was cancelled before it arrived
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    return wrapper
+
 
 class BaseLLMAPI(ABC):
     """
     Abstract base class for LLM APIs.
     Defines the interface that all LLM APIs must implement.
     """
+    # Maximum number of responses kept in the per-instance LRU cache (0 disables caching)
+    cache_size: int = 0
+    VERBOSE: bool = False
+    CONFIRMATION_PRINT: bool = False
+
+    _http = None
+    _http_lock = threading.Lock()
+
+    @classmethod
+    def shared_http_client(cls):
+        """
+        Return the process-wide `httpx.Client` shared by all SDK-based providers.
+        Reusing one keep-alive pool avoids a fresh TCP + TLS handshake per client instance, and idle
+        connections are kept for 5 minutes so they survive the pause between conversation turns;
+        HTTP/2 multiplexing is enabled when the optional `h2` package is installed.
+        """
+        if BaseLLMAPI._http is None:
+            with BaseLLMAPI._http_lock:
+                if BaseLLMAPI._http is None:
+                    import httpx
+                    BaseLLMAPI._http = httpx.Client(
+                        http2=importlib.util.find_spec("h2") is not None,
+                        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=300.0),
+                        timeout=httpx.Timeout(600.0, connect=5.0),
+                    )
+                    atexit.register(BaseLLMAPI._http.close)
+        return BaseLLMAPI._http
+
     @abstractmethod
     def generate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
         """
         Send the conversation and tool definitions to the LLM and get a response.
-        
+
         :param messages: A list of messages in a standardized format.
         :param tools: A list of tools (functions) definitions that the LLM can call.
         :return: A dictionary containing the model's response.
         """
-        pass
\ No newline at end of file
+        pass
+
+    @cached_agenerate
+    async def agenerate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        """
+        Async version of `generate`, so several providers (or conversations) can be awaited
+        concurrently with `asyncio.gather`. Providers with an async SDK client override this;
+        the default runs the blocking `generate` in a worker thread.
+        """
+        return await asyncio.to_thread(self.generate, messages, tools)
+
+    def generate_stream(self, messages: List[Dict], tools: List[Dict]) -> Iterator[Dict]:
+        """
+        Stream the response as it is generated, so callers can show text or start running a
+        tool call before the whole response has arrived. Providers with a streaming endpoint
+        override this; the default replays the result of `generate`.
+
+        :param messages: A list of messages in a standardized format.
+        :param tools: A list of tools (functions) definitions that the LLM can call.
+        :return: An iterator of events: `{"type": "text_delta", "text": ...}` for each text
+                 fragment, a complete `tool_use` block as soon as a tool call is finalized, and
+                 finally `{"type": "response", "response": ...}` holding the same dictionary
+                 `generate` would have returned.
+        """
+        response = self.generate(messages, tools)
+        for block in response.get("content", []):
+            if block.get("type") == "text":
+                yield {"type":"text_delta","text":block.get("text", "")}
+            elif block.get("type") == "tool_use":
+                yield block
+        yield {"type":"response","response":response}
+
+    def generate_batch(self, conversations: List[List[Dict]], tools: List[Dict]) -> List[Dict]:
+        """
+        Generate responses for several independent conversations.
+        Providers with a Batch API override this to submit all conversations as one
+        discounted, asynchronous batch; the default simply calls `generate` for each.
+
+        :param conversations: A list of message lists in the standardized format.
+        :param tools: Tool definitions shared by all conversations.
+        :return: One response dictionary per conversation, in the same order.
+        """
+        return [self.generate(messages, tools) for messages in conversations]
+
+    def _convert_messages_cached(self, messages: List[Dict], convert_message: Callable) -> List:
+        """
+        Convert each message with `convert_message`, reusing the result from the previous call
+        for messages that are unchanged, so each turn only converts the newly appended messages.
+
+        Entries are keyed by `id(msg)` and keep a reference to the message and its content list:
+        holding them prevents the ids from being reused, and a replaced content list (e.g. an
+        updated system prompt) invalidates the entry. The cache is rebuilt from the current
+        conversation on every call, so it never outgrows it.
+        """
+        previous = getattr(self, "_msg_cache", None) or {}
+        current = {}
+        converted = []
+        for msg in messages:
+            entry = previous.get(id(msg))
+            if entry is None or entry[0] is not msg or entry[1] is not msg.get("content"):
+                entry = (msg, msg.get("content"), convert_message(msg))
+            current[id(msg)] = entry
+            converted.append(entry[2])
+        self._msg_cache = current
+        return converted
+
+    def _serialized_tools(self, tools: Optional[List[Dict]]) -> str:
+        """
+        Canonical JSON of the tool definitions, serialized once per tool list.
+        The same list object is passed on every turn, so the result is kept (with a reference
+        to the list, so its id cannot be reused) until a different list comes in. Tool lists
+        are treated as immutable once handed to the API.
+        """
+        cached = getattr(self, "_tools_json_cache", None)
+        if cached is not None and cached[0] is tools:
+            return cached[1]
+        text = dumps(tools or [], sort_keys=True, default=str)
+        self._tools_json_cache = (tools, text)
+        return text
+
+    def _cache_key(self, messages: List[Dict], tools: List[Dict]) -> str:
+        """
+        Build the cache key from the model, the tool definitions and the full message history.
+        Hashing the whole history (not just the last user turn) keeps follow-up questions
+        such as "explain that again" from hitting answers given in a different context.
+        """
+        model = getattr(self, "model_name", None) or getattr(self, "model", "")
+        payload = dumps({"model": str(model), "messages": messages}, sort_keys=True, default=str)
+        key = hashlib.blake2b(digest_size=16)
+        key.update(self._serialized_tools(tools).encode("utf-8"))
+        key.update(payload.encode("utf-8"))
+        return key.hexdigest()
+
+    def _cache_lookup(self, key: str) -> Optional[Dict]:
+        cache = getattr(self, "_response_cache", None)
+        if cache is None or key not in cache:
+            return None
+        cache.move_to_end(key)
+        return copy.deepcopy(cache[key])
+
+    def _cache_store(self, key: str, response: Dict):
+        cache = getattr(self, "_response_cache", None)
+        if cache is None:
+            cache = self._response_cache = OrderedDict()
+        cache[key] = copy.deepcopy(response)
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def clear_cache(self):
+        self._response_cache = None
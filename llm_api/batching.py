@@ -0,0 +1,95 @@
+# llm_api/batching.py
+import io
+import time
+from typing import List, Dict, Any
+from llm_api.json_utils import dumps, loads
+
+
+def _wait_with_backoff(poll, is_done, poll_interval: float, max_poll_interval: float):
+    """
+    Call `poll()` until `is_done(result)` is true, doubling the sleep between polls up to
+    `max_poll_interval` seconds. Returns the last polled result.
+    """
+    delay = poll_interval
+    while True:
+        result = poll()
+        if is_done(result):
+            return result
+        time.sleep(delay)
+        delay = min(delay * 2, max_poll_interval)
+
+
+def run_openai_batch(client, bodies: List[Dict], endpoint: str = "/v1/chat/completions",
+                     poll_interval: float = 5.0, max_poll_interval: float = 60.0) -> List[Dict]:
+    """
+    Submit chat completion request bodies through an OpenAI-compatible Batch API
+    (OpenAI and Groq) and block until the batch finishes.
+
+    :param client: An `OpenAI` SDK client (optionally pointed at another base_url).
+    :param bodies: Request bodies, exactly as they would be passed to `chat.completions.create`.
+    :return: The response bodies, in the same order as `bodies`.
+    """
+    lines = []
+    for idx, body in enumerate(bodies):
+        lines.append(dumps({"custom_id": str(idx), "method": "POST", "url": endpoint, "body": body}))
+    jsonl = ("\n".join(lines) + "\n").encode("utf-8")
+
+    batch_file = client.files.create(file=("batch_requests.jsonl", io.BytesIO(jsonl)), purpose="batch")
+    batch = client.batches.create(input_file_id=batch_file.id, endpoint=endpoint, completion_window="24h")
+
+    batch = _wait_with_backoff(
+        lambda: client.batches.retrieve(batch.id),
+        lambda b: b.status in ("completed", "failed", "expired", "cancelled"),
+        poll_interval,
+        max_poll_interval,
+    )
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch.id} finished with status '{batch.status}'.")
+
+    results: Dict[str, Any] = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        entry = loads(line)
+        response = entry.get("response") or {}
+        if entry.get("error") or response.get("status_code", 200) != 200:
+            raise RuntimeError(f"Batch request {entry.get('custom_id')} failed: {entry.get('error') or response}")
+        results[entry["custom_id"]] = response["body"]
+
+    missing = [str(idx) for idx in range(len(bodies)) if str(idx) not in results]
+    if missing:
+        raise RuntimeError(f"Batch {batch.id} returned no result for requests: {', '.join(missing)}")
+    return [results[str(idx)] for idx in range(len(bodies))]
+
+
+def run_anthropic_batch(client, params_list: List[Dict],
+                        poll_interval: float = 5.0, max_poll_interval: float = 60.0) -> List[Any]:
+    """
+    Submit `messages.create` parameter dicts through the Anthropic Message Batches API
+    and block until processing has ended.
+
+    :param client: An `Anthropic` SDK client.
+    :param params_list: Parameters, exactly as they would be passed to `messages.create`.
+    :return: The resulting `Message` objects, in the same order as `params_list`.
+    """
+    batch = client.messages.batches.create(
+        requests=[{"custom_id": str(idx), "params": params} for idx, params in enumerate(params_list)]
+    )
+
+    batch = _wait_with_backoff(
+        lambda: client.messages.batches.retrieve(batch.id),
+        lambda b: b.processing_status == "ended",
+        poll_interval,
+        max_poll_interval,
+    )
+
+    results: Dict[str, Any] = {}
+    for entry in client.messages.batches.results(batch.id):
+        if entry.result.type != "succeeded":
+            raise RuntimeError(f"Batch request {entry.custom_id} did not succeed: {entry.result.type}")
+        results[entry.custom_id] = entry.result.message
+
+    missing = [str(idx) for idx in range(len(params_list)) if str(idx) not in results]
+    if missing:
+        raise RuntimeError(f"Batch {batch.id} returned no result for requests: {', '.join(missing)}")
+    return [results[str(idx)] for idx in range(len(params_list))]
@@ -1,39 +1,46 @@
 # llm_api/gemini_api.py
 
 import os
-from typing import List, Dict
+import hashlib
+from typing import List, Dict, Iterator
 import google.generativeai as genai
 from google.ai.generativelanguage_v1beta.types import content
-from llm_api.base_api import BaseLLMAPI
+from llm_api.base_api import BaseLLMAPI, cached_generate, cached_agenerate, join_text_blocks
+from llm_api.json_utils import dumps
 
 genai.configure(api_key=os.environ.get("GEMINI_API_KEY", ""))
 
-# Map JSON schema types to Gemini content.Type
+# Map JSON schema types to Gemini content.Type; unknown types fall back to OBJECT
+_TYPE_MAP = {
+    "string": content.Type.STRING,
+    "number": content.Type.NUMBER,
+    "integer": content.Type.INTEGER,
+    "boolean": content.Type.BOOL,
+    "array": content.Type.ARRAY,
+    "object": content.Type.OBJECT,
+}
+
+# Converted tool protos, keyed by a hash of the tool schema they were built from
+_TOOL_CACHE: Dict[str, List[genai.protos.Tool]] = {}
+
 def map_json_type_to_content_type(json_type: str) -> content.Type:
-    json_type = json_type.lower()
-    if json_type == "string":
-        return content.Type.STRING
-    elif json_type == "number":
-        return content.Type.NUMBER
-    elif json_type == "boolean":
-        return content.Type.BOOL
-    elif json_type == "array":
-        return content.Type.ARRAY
-    elif json_type == "object":
-        return content.Type.OBJECT
-    else:
-        return content.Type.OBJECT
+    return _TYPE_MAP.get(json_type.lower(), content.Type.OBJECT)
 
-def convert_schema_to_gemini(parameters: dict) -> content.Schema:
+def _build_schema_node(parameters: dict):
     """
-    Recursively convert the JSON schema to Gemini schema.
+    Build the Gemini schema for one JSON schema node, without its child schemas.
+    Returns the schema and its content type.
     """
-    schema_type = parameters.get("type", parameters.get("type_", "object"))
-    ctype = map_json_type_to_content_type(schema_type)
+    get = parameters.get
+    schema_type = get("type", get("type_", "object"))
+    # Schema types are almost always lowercase already; only normalize on a miss
+    ctype = _TYPE_MAP.get(schema_type)
+    if ctype is None:
+        ctype = map_json_type_to_content_type(schema_type)
     schema_builder = content.Schema(type=ctype)
 
     # Required fields
-    required_fields = parameters.get("required", [])
+    required_fields = get("required", [])
     if required_fields:
         schema_builder.required.extend(required_fields)
 
@@ -41,25 +48,51 @@ def convert_schema_to_gemini(parameters: dict) -> content.Schema:
     if "enum" in parameters:
         schema_builder.enum[:] = parameters["enum"]
 
-    # Properties if object
-    props = parameters.get("properties", {})
-    for prop_name, prop_schema in props.items():
-        child_schema = convert_schema_to_gemini(prop_schema)
-        schema_builder.properties[prop_name] = child_schema
-
-    # Items if array
-    if ctype == content.Type.ARRAY:
-        items = parameters.get("items", {})
-        if items:
-            item_schema = convert_schema_to_gemini(items)
-            schema_builder.items.CopyFrom(item_schema)
-
     # Description
-    description = parameters.get("description")
+    description = get("description")
     if description:
         schema_builder.description = description
 
-    return schema_builder
+    return schema_builder, ctype
+
+# Stands in for a property name when a node is the `items` schema of its parent array
+_ITEMS = object()
+
+def convert_schema_to_gemini(parameters: dict) -> content.Schema:
+    """
+    Convert the JSON schema to Gemini schema.
+    Nested schemas are walked with an explicit stack instead of recursion. Assigning a
+    child into its parent copies it, so every node is built first and children are then
+    attached bottom-up, each one complete before it is copied.
+    """
+    array_type = content.Type.ARRAY
+    nodes = []  # (schema, parent index, property name or _ITEMS), parents before children
+    stack = [(parameters, -1, None)]
+    while stack:
+        node_params, parent, key = stack.pop()
+        schema_builder, ctype = _build_schema_node(node_params)
+        index = len(nodes)
+        nodes.append((schema_builder, parent, key))
+
+        # Properties if object
+        for prop_name, prop_schema in node_params.get("properties", {}).items():
+            stack.append((prop_schema, index, prop_name))
+
+        # Items if array
+        if ctype == array_type:
+            items = node_params.get("items", {})
+            if items:
+                stack.append((items, index, _ITEMS))
+
+    # Reverse pre-order visits every child before its parent
+    for schema_builder, parent, key in reversed(nodes[1:]):
+        parent_schema = nodes[parent][0]
+        if key is _ITEMS:
+            parent_schema.items.CopyFrom(schema_builder)
+        else:
+            parent_schema.properties[key] = schema_builder
+
+    return nodes[0][0]
 
 def convert_tool_schema_to_gemini(tools_schema: list[dict]) -> List[genai.protos.Tool]:
     """
@@ -82,19 +115,31 @@ def convert_tool_schema_to_gemini(tools_schema: list[dict]) -> List[genai.protos
 
     return [genai.protos.Tool(function_declarations=declarations)]
 
+def cached_tool_schema_to_gemini(tools_schema: list[dict]) -> List[genai.protos.Tool]:
+    """
+    Same as `convert_tool_schema_to_gemini`, but reuses the protos built for an identical
+    schema earlier in the process, since tool sets rarely change between GeminiAPI instances.
+    """
+    key = hashlib.blake2b(dumps(tools_schema, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    gemini_tools = _TOOL_CACHE.get(key)
+    if gemini_tools is None:
+        gemini_tools = _TOOL_CACHE[key] = convert_tool_schema_to_gemini(tools_schema)
+    return gemini_tools
+
 class GeminiAPI(BaseLLMAPI):
     """
     Gemini LLM integration.
     """
-    def __init__(self, model_name: str = "gemini-2.0-flash-exp", VERBOSE=False, CONFIRMATION_PRINT=False, tools_schema=None):
+    def __init__(self, model_name: str = "gemini-2.0-flash-exp", VERBOSE=False, CONFIRMATION_PRINT=False, tools_schema=None, cache_size: int = 0):
         self.model_name = model_name
         self.VERBOSE = VERBOSE
         self.CONFIRMATION_PRINT = CONFIRMATION_PRINT
+        self.cache_size = cache_size
 
         # Convert provided schema to Gemini format if given
         gemini_tools = []
         if tools_schema:
-            gemini_tools = convert_tool_schema_to_gemini(tools_schema)
+            gemini_tools = cached_tool_schema_to_gemini(tools_schema)
 
         generation_config = {
             "temperature": 1,
@@ -104,11 +149,36 @@ class GeminiAPI(BaseLLMAPI):
             "response_mime_type": "text/plain",
         }
 
+        self._generation_config = generation_config
+        self._tools = gemini_tools
         self.model = genai.GenerativeModel(
             model_name=self.model_name,
             generation_config=generation_config,
             tools=gemini_tools,
         )
+        # The system prompt is fixed per GenerativeModel; keep one model per prompt seen
+        self._models_by_system = {"": self.model}
+
+    def _convert_message(self, msg: Dict):
+        role = msg["role"]
+        text = join_text_blocks(msg["content"]).strip()
+
+        if role == "system":
+            return {"role":"system","content":text}
+
+        if role == "tool":
+            # Treat tool messages as user messages containing tool result
+            tool_call_id = msg.get("tool_call_id")
+            if tool_call_id:
+                text_content = f"Tool result for {tool_call_id}: {text}"
+            else:
+                text_content = text
+            return {"role":"user","content":text_content}
+
+        # For user/assistant normal messages
+        if text:
+            return {"role":role,"content":text}
+        return None
 
     def _convert_messages(self, messages: List[Dict]):
         """
@@ -116,53 +186,49 @@ class GeminiAPI(BaseLLMAPI):
         """
         system_prompt = ""
         normal_msgs = []
-        for msg in messages:
-            role = msg["role"]
-            cblocks = msg["content"]
-
-            if role == "system":
-                stext = " ".join(b.get("text","") for b in cblocks if b["type"]=="text").strip()
-                system_prompt = stext
+        for converted in self._convert_messages_cached(messages, self._convert_message):
+            if converted is None:
                 continue
-
-            if role == "tool":
-                # Treat tool messages as user messages containing tool result
-                txt = " ".join(b.get("text","") for b in cblocks if b["type"]=="text").strip()
-                tool_call_id = msg.get("tool_call_id")
-                if tool_call_id:
-                    text_content = f"Tool result for {tool_call_id}: {txt}"
-                else:
-                    text_content = txt
-                normal_msgs.append({"role":"user","content":text_content})
+            if converted["role"] == "system":
+                system_prompt = converted["content"]
                 continue
-
-            # For user/assistant normal messages
-            msg_text = " ".join(b.get("text","") for b in cblocks if b["type"]=="text").strip()
-            if msg_text:
-                normal_msgs.append({"role":role,"content":msg_text})
+            normal_msgs.append(converted)
 
         return system_prompt, normal_msgs
 
-    def generate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+    def _model_for(self, system_prompt: str):
+        model = self._models_by_system.get(system_prompt)
+        if model is None:
+            model = self._models_by_system[system_prompt] = genai.GenerativeModel(
+                model_name=self.model_name,
+                generation_config=self._generation_config,
+                tools=self._tools,
+                system_instruction=system_prompt,
+            )
+        return model
+
+    def _build_request(self, messages: List[Dict]):
+        """
+        Return the model carrying the conversation's system prompt and the full history
+        as Gemini `contents`, so each turn is a single `generate_content` round-trip.
+        """
         system_prompt, gen_messages = self._convert_messages(messages)
+        contents = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+            for m in gen_messages
+        ]
+        return self._model_for(system_prompt), contents
 
-        params = {
-            "model": self.model_name,
-            "messages": gen_messages,
-            "max_tokens": 4096,
-            "temperature": 0,
-            "system": system_prompt
+    @staticmethod
+    def _tool_use_block(function_call) -> Dict:
+        return {
+            "type":"tool_use",
+            "id": function_call.name, # Gemini does not provide an id, we could generate one
+            "name": function_call.name,
+            "input": function_call.args
         }
 
-        # Gemini python client does not have a direct 'tools' param here,
-        # since we provided them at model creation time.
-
-        response = self.model.start_chat(enable_automatic_function_calling=False, history=[]).send_message(gen_messages[-1]["content"])
-        if self.VERBOSE:
-            print("Gemini raw api response:", response)
-        if self.CONFIRMATION_PRINT:
-            print("GEMINI RESPONSE RECEIVED")
-
+    def _parse_response(self, response) -> Dict:
         # The response is a google.generativeai result. Extract content blocks.
         content_blocks = []
         has_tool_calls = False
@@ -173,14 +239,53 @@ class GeminiAPI(BaseLLMAPI):
                     content_blocks.append({"type":"text","text":part.text.strip()})
                 elif part.function_call:
                     has_tool_calls = True
-                    content_blocks.append({
-                        "type":"tool_use",
-                        "id": part.function_call.name, # Gemini does not provide an id, we could generate one
-                        "name": part.function_call.name,
-                        "input": part.function_call.args
-                    })
+                    content_blocks.append(self._tool_use_block(part.function_call))
 
         return {
             "content": content_blocks,
             "stop_reason": "tool_use" if has_tool_calls else "stop_sequence"
-        }
\ No newline at end of file
+        }
+
+    @cached_generate
+    def generate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        # Tools were converted once at construction time and are attached to the model
+        model, contents = self._build_request(messages)
+
+        response = model.generate_content(contents)
+        if self.VERBOSE:
+            print("Gemini raw api response:", response)
+        if self.CONFIRMATION_PRINT:
+            print("GEMINI RESPONSE RECEIVED")
+
+        return self._parse_response(response)
+
+    @cached_agenerate
+    async def agenerate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        model, contents = self._build_request(messages)
+
+        response = await model.generate_content_async(contents)
+        if self.VERBOSE:
+            print("Gemini raw api response:", response)
+        if self.CONFIRMATION_PRINT:
+            print("GEMINI RESPONSE RECEIVED")
+
+        return self._parse_response(response)
+
+    def generate_stream(self, messages: List[Dict], tools: List[Dict]) -> Iterator[Dict]:
+        model, contents = self._build_request(messages)
+
+        response = model.generate_content(contents, stream=True)
+        for chunk in response:
+            for candidate in chunk.candidates:
+                for part in candidate.content.parts:
+                    if part.text:
+                        yield {"type":"text_delta","text":part.text}
+                    elif part.function_call:
+                        # Gemini sends each function call whole, never split across chunks
+                        yield self._tool_use_block(part.function_call)
+
+        if self.VERBOSE:
+            print("Gemini raw api response:", response)
+        if self.CONFIRMATION_PRINT:
+            print("GEMINI RESPONSE RECEIVED")
+        yield {"type":"response","response":self._parse_response(response)}
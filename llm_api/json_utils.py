@@ -0,0 +1,57 @@
+# llm_api/json_utils.py
+import json
+from typing import Any, Callable, Dict, Optional, Union
+
+# orjson is an optional speed-up; everything falls back to the standard library without it.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None,
+          indent: Optional[int] = None) -> str:
+    """
+    Serialize `obj` to a compact JSON string, using orjson when it is installed.
+    Objects orjson cannot handle (e.g. non-string dict keys) go through the stdlib encoder,
+    which uses the same separators and keeps non-ASCII characters as is. Both backends give
+    equivalent JSON, but not always the same text: float exponents differ (orjson writes
+    1e20, the stdlib 1e+20), and only the stdlib accepts non-string keys. Hashes of this
+    output are therefore only stable for a given backend.
+
+    :param sort_keys: Sort object keys, for output that is stable enough to hash.
+    :param default: Called for objects that are not JSON serializable, as in `json.dumps`.
+    :param indent: Pretty-print with this many spaces. orjson only indents by 2; other widths
+                   use the stdlib encoder.
+    """
+    if orjson is not None and indent in (None, 2):
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+        except TypeError:
+            pass
+    # Same separators and escaping as orjson, so typical payloads serialize to the same text
+    separators = (",", ":") if indent is None else (",", ": ")
+    return json.dumps(obj, sort_keys=sort_keys, default=default, indent=indent,
+                      separators=separators, ensure_ascii=False)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse a JSON document, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_tool_arguments(arguments: Union[str, bytes, Dict, None]) -> Dict:
+    """
+    Return tool-call arguments as a dict.
+    Some SDK versions already hand back parsed arguments, in which case no re-parse is done.
+    """
+    if isinstance(arguments, dict):
+        return arguments
+    if not arguments:
+        return {}
+    return loads(arguments)
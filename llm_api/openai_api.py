@@ -1,79 +1,33 @@
 # llm_api/openai_api.py
 import os
-import json
-from typing import List, Dict
-from llm_api.base_api import BaseLLMAPI
-from openai import OpenAI
+from typing import List, Dict, Iterator
+from llm_api.base_api import BaseLLMAPI, cached_generate, cached_agenerate, to_openai_compat_message, iter_openai_compat_stream
+from llm_api.batching import run_openai_batch
+from llm_api.json_utils import parse_tool_arguments
+from openai import OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletion
 
 class OpenAIAPI(BaseLLMAPI):
     """
     OpenAI LLM API integration.
     """
-    def __init__(self, model_name: str = "gpt-4o", VERBOSE=False, CONFIRMATION_PRINT=False):
+    def __init__(self, model_name: str = "gpt-4o", VERBOSE=False, CONFIRMATION_PRINT=False, cache_size: int = 0, http_client=None):
         api_key = os.environ.get("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("No OPENAI_API_KEY found.")
-        self.client = OpenAI()
+        self.client = OpenAI(api_key=api_key, http_client=http_client or self.shared_http_client())
+        self.aclient = AsyncOpenAI(api_key=api_key)
         self.model = model_name
         self.VERBOSE = VERBOSE
         self.CONFIRMATION_PRINT = CONFIRMATION_PRINT
+        self.cache_size = cache_size
 
-    def _to_openai_messages(self, messages: List[Dict]) -> List[Dict]:
-        openai_messages = []
-        for msg in messages:
-            role = msg["role"]
-            if role == "tool":
-                # Tool messages
-                tool_call_id = msg.get("tool_call_id")
-                if not tool_call_id:
-                    raise ValueError("Missing tool_call_id in tool message.")
-                text_content = " ".join(b.get("text","") for b in msg["content"] if b["type"]=="text")
-                openai_messages.append({
-                    "role":"tool",
-                    "tool_call_id":tool_call_id,
-                    "content": text_content
-                })
-                continue
-
-            content_blocks = msg["content"]
-            text_parts = []
-            tool_calls = []
-            for block in content_blocks:
-                if not isinstance(block, dict):
-                    # If by any chance a string slips through, convert to dict
-                    block = {"type":"text","text":str(block)}
-                btype = block.get("type","text")
-                if btype == "text":
-                    text_parts.append(block.get("text",""))
-                elif btype == "tool_use":
-                    tool_calls.append({
-                        "id": block["id"],
-                        "type": "function",
-                        "function": {
-                            "name": block["name"],
-                            "arguments": json.dumps(block["input"])
-                        }
-                    })
-                elif btype == "image":
-                    text_parts.append("[Image data omitted]")
-
-            text_content = " ".join(text_parts).strip()
+    _convert_message = staticmethod(to_openai_compat_message)
 
-            if role == "assistant" and tool_calls:
-                m = {"role": "assistant"}
-                if text_content:
-                    m["content"] = text_content
-                m["tool_calls"] = tool_calls
-                openai_messages.append(m)
-            else:
-                openai_messages.append({
-                    "role": role,
-                    "content": text_content if text_content else ""
-                })
-
-        return openai_messages
+    def _to_openai_messages(self, messages: List[Dict]) -> List[Dict]:
+        return self._convert_messages_cached(messages, self._convert_message)
 
-    def generate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+    def _build_params(self, messages: List[Dict], tools: List[Dict]) -> Dict:
         openai_messages = self._to_openai_messages(messages)
         params = {
             "model": self.model,
@@ -83,13 +37,9 @@ class OpenAIAPI(BaseLLMAPI):
         if tools:
             params["tools"] = tools
             params["tool_choice"] = "auto"
+        return params
 
-        response = self.client.chat.completions.create(**params)
-        if self.VERBOSE:
-            print("OpenAI raw api response:", response)
-        if self.CONFIRMATION_PRINT:
-            print("OPENAI RESPONSE RECEIVED")
-
+    def _parse_response(self, response) -> Dict:
         message = response.choices[0].message
         if message.tool_calls:
             tool_calls = []
@@ -98,11 +48,55 @@ class OpenAIAPI(BaseLLMAPI):
                     "type": "tool_use",
                     "id": tc.id,
                     "name": tc.function.name,
-                    "input": json.loads(tc.function.arguments)
+                    "input": parse_tool_arguments(tc.function.arguments)
                 })
             return {"content": tool_calls, "stop_reason": "tool_use"}
 
         return {
             "content": [{"type":"text","text":message.content}],
             "stop_reason":"stop_sequence"
-        }
\ No newline at end of file
+        }
+
+    @cached_generate
+    def generate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        response = self.client.chat.completions.create(**self._build_params(messages, tools))
+        if self.VERBOSE:
+            print("OpenAI raw api response:", response)
+        if self.CONFIRMATION_PRINT:
+            print("OPENAI RESPONSE RECEIVED")
+
+        return self._parse_response(response)
+
+    @cached_agenerate
+    async def agenerate(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        response = await self.aclient.chat.completions.create(**self._build_params(messages, tools))
+        if self.VERBOSE:
+            print("OpenAI raw api response:", response)
+        if self.CONFIRMATION_PRINT:
+            print("OPENAI RESPONSE RECEIVED")
+
+        return self._parse_response(response)
+
+    def generate_stream(self, messages: List[Dict], tools: List[Dict]) -> Iterator[Dict]:
+        stream = self.client.chat.completions.create(**self._build_params(messages, tools), stream=True)
+        for event in iter_openai_compat_stream(stream):
+            if event["type"] == "response":
+                if self.VERBOSE:
+                    print("OpenAI streamed response:", event["response"])
+                if self.CONFIRMATION_PRINT:
+                    print("OPENAI RESPONSE RECEIVED")
+            yield event
+
+    def generate_batch(self, conversations: List[List[Dict]], tools: List[Dict]) -> List[Dict]:
+        """
+        Submit all conversations through the OpenAI Batch API (about half the price of
+        interactive calls, up to 24h turnaround) and return one response per conversation.
+        """
+        bodies = [self._build_params(messages, tools) for messages in conversations]
+        results = run_openai_batch(self.client, bodies)
+        if self.VERBOSE:
+            print("OpenAI raw batch results:", results)
+        if self.CONFIRMATION_PRINT:
+            print("OPENAI BATCH RESULTS RECEIVED")
+
+        return [self._parse_response(ChatCompletion.model_validate(body)) for body in results]
@@ -0,0 +1,54 @@
+# llm_api/rate_limit.py
+import asyncio
+import time
+
+
+class _Bucket:
+    """Token bucket holding up to `capacity` units, refilled evenly over one minute."""
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available; 0 if they are now."""
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class RateLimiter:
+    """
+    Async limiter for requests-per-minute and tokens-per-minute quotas.
+
+    `acquire` waits until a request with the estimated token count fits in both budgets and
+    reserves it; `record` then replaces the estimate with the usage the API reported. Buckets are
+    refilled from the monotonic clock whenever they are checked, so no background task is needed
+    and one limiter can be shared across event loops.
+    """
+    def __init__(self, max_rpm: int, max_tpm: int):
+        self._requests = _Bucket(max_rpm)
+        self._tokens = _Bucket(max_tpm)
+
+    async def acquire(self, est_tokens: int = 0):
+        # Requests larger than the per-minute budget only have to wait for a full bucket
+        est_tokens = min(est_tokens, self._tokens.capacity)
+        while True:
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            wait = max(self._requests.wait_time(1), self._tokens.wait_time(est_tokens))
+            if wait <= 0:
+                # No await between the check and the reservation, so concurrent callers cannot overdraw
+                self._requests.level -= 1
+                self._tokens.level -= est_tokens
+                return
+            await asyncio.sleep(wait)
+
+    def record(self, actual_tokens: int, est_tokens: int = 0):
+        """Correct the token budget once the real usage of a request acquired with `est_tokens` is known."""
+        est_tokens = min(est_tokens, self._tokens.capacity)
+        self._tokens.level -= actual_tokens - est_tokens
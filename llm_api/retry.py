@@ -0,0 +1,60 @@
+# llm_api/retry.py
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+# SDK exception class names for connection problems; the SDKs are not imported here
+_TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "ServiceUnavailable", "DeadlineExceeded"}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Return True for errors worth retrying: rate limits (429), server errors (5xx),
+    timeouts and dropped connections. Works across the provider SDKs by looking at the
+    HTTP status code they attach to their exceptions.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return type(error).__name__ in _TRANSIENT_ERROR_NAMES
+
+
+def retry_call(func: Callable[..., T], *args, attempts: int = 5, initial_delay: float = 0.5,
+               max_delay: float = 8.0, **kwargs) -> T:
+    """
+    Call `func(*args, **kwargs)`, retrying transient errors with exponential backoff and full jitter.
+
+    :param attempts: Total number of calls, including the first one.
+    :param initial_delay: Upper bound of the first sleep in seconds; it doubles per retry.
+    :param max_delay: Cap on the sleep between two attempts.
+    :return: The result of the first successful call. The last error is raised once
+             the attempts are used up, and non-transient errors are raised right away.
+    """
+    delay = initial_delay
+    for attempt in range(1, attempts + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == attempts or not is_transient_error(e):
+                raise
+        time.sleep(random.uniform(0, delay))
+        delay = min(delay * 2, max_delay)
+
+
+async def aretry_call(func: Callable[..., Awaitable[T]], *args, attempts: int = 5, initial_delay: float = 0.5,
+                      max_delay: float = 8.0, **kwargs) -> T:
+    """Async version of `retry_call`: awaits `func(*args, **kwargs)` and sleeps without blocking the loop."""
+    delay = initial_delay
+    for attempt in range(1, attempts + 1):
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            if attempt == attempts or not is_transient_error(e):
+                raise
+        await asyncio.sleep(random.uniform(0, delay))
+        delay = min(delay * 2, max_delay)
@@ -1,51 +1,102 @@
 import re
-import time
+import sys
 import threading
+from functools import lru_cache
 from wcwidth import wcswidth
 
-_lock = threading.Lock()
-_last_print_time = 0
-_min_print_gap = 0.002  # minimum gap between prints in seconds
+# Serializes box writes from tool calls running in worker threads so boxes never interleave
+_write_lock = threading.Lock()
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+_ANSI_SUB = _ANSI_RE.sub
+
+# ANSI color codes
+BLUE = '\033[94m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+RED = '\033[91m'
+WHITE = '\033[97m'
+RESET = '\033[0m'
+BOLD = '\033[1m'
+
+BOX_WIDTH = 96  # inner width of every box
+_H_LINE = "─" * BOX_WIDTH
+# Line padding is sliced from here rather than built with ' ' * n for every line
+_SPACES = " " * BOX_WIDTH
+
+def _borders(box_color: str = "") -> tuple:
+    """Top, separator and bottom border lines of a box drawn in `box_color`."""
+    return (
+        f"\n{BOLD}{box_color}┌{_H_LINE}┐{RESET}",
+        f"{BOLD}{box_color}├{_H_LINE}┤{RESET}",
+        f"{BOLD}{box_color}└{_H_LINE}┘{RESET}\n",
+    )
+
+_TOOL_BORDERS = _borders()
+def _role_box(header: str, box_color: str) -> tuple:
+    """Header line, left and right side borders, and top/separator/bottom borders of a role box."""
+    return (header, f"{box_color}│{RESET} ", f"{box_color}│{RESET}", _borders(box_color))
+
+# Anything but "agent" is drawn as a user box
+_AGENT_BOX = _role_box(f"🤖 {WHITE}AGENT RESPONSE:{RESET}", RED)
+_USER_BOX = _role_box(f"👤 {WHITE}USER MESSAGE:{RESET}", GREEN)
+
+# Lines wider than WRAP_WIDTH columns are split into chunks of about WRAP_AT characters
+WRAP_WIDTH = 90
+WRAP_AT = 80
 
 def strip_ansi_codes(s: str) -> str:
     """Remove ANSI escape codes from a string."""
-    ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
-    return ansi_escape.sub('', s)
+    return _ANSI_SUB('', s)
 
+@lru_cache(maxsize=8192)
 def get_display_width(s: str) -> int:
-    """Return the display width of a string considering wide chars and emojis."""
+    """
+    Return the display width of a string considering wide chars and emojis.
+    Memoized on the raw (still colored) string, since the same labels and lines recur across
+    boxes: a repeated line skips both the ANSI strip and the width computation.
+    """
     s_clean = strip_ansi_codes(s)
+    # Plain ASCII is one column per character; only other text needs the wcwidth tables
+    if s_clean.isascii():
+        return len(s_clean)
     width = wcswidth(s_clean)
     # wcswidth returns -1 if it encounters a non-printable/wide char it can't handle
     if width < 0:
         width = len(s_clean)  # Fallback: at least count characters if something is unusual
     return width
 
-def ensure_min_time_gap():
-    global _last_print_time
-    with _lock:
-        current_time = time.time()
-        time_since_last = current_time - _last_print_time
-        if _last_print_time > 0 and time_since_last < _min_print_gap:
-            time.sleep(_min_print_gap - time_since_last)
-        _last_print_time = time.time()
+def _wrap_line(line: str) -> list:
+    """
+    Split a line wider than WRAP_WIDTH columns into chunks of about WRAP_AT characters,
+    breaking at the nearest space where possible. Empty chunks are dropped.
+    """
+    parts = []
+    while get_display_width(line) > WRAP_WIDTH:
+        # find a split point near WRAP_AT chars to keep lines neat,
+        # moved back to the nearest space if there is one
+        split_point = WRAP_AT
+        if len(line) > WRAP_AT:
+            split_point = line.rfind(' ', 1, WRAP_AT + 1)
+            if split_point <= 0:
+                split_point = WRAP_AT
+        # keep the first part and continue with the remainder
+        parts.append(line[:split_point])
+        line = line[split_point:].strip()
+    if line:
+        parts.append(line)
+    return parts
+
+def _write_box(lines: list):
+    """Write a fully assembled box to stdout in a single call."""
+    text = "\n".join(lines) + "\n"
+    with _write_lock:
+        sys.stdout.write(text)
 
 
 def print_tool_call(tool_name: str, arguments: dict, result: str):
     """
     Prints a nicely formatted output whenever a tool is called.
     """
-    # ANSI color codes
-    BLUE = '\033[94m'
-    GREEN = '\033[92m'
-    YELLOW = '\033[93m'
-    RESET = '\033[0m'
-    BOLD = '\033[1m'
-    
-    ensure_min_time_gap()
-
-    width = 96  # desired width of the box
-
     # Prepare lines
     content_lines = [
         f"🔧 TOOL CALLED: {BLUE}{tool_name}{RESET}",
@@ -58,65 +109,37 @@ def print_tool_call(tool_name: str, arguments: dict, result: str):
     # Split result lines if they are too long
     if result.strip():
         for line in result.splitlines():
-            while get_display_width(line) > 90:
-                # find a split point near 80 chars to keep lines neat
-                split_point = 80
-                # move split point to a nearest space if possible
-                while split_point > 0 and split_point < len(line) and line[split_point] != ' ':
-                    split_point -= 1
-                if split_point == 0:
-                    split_point = 80
-                # append the first part
-                content_lines.append(f"{GREEN}{line[:split_point]}{RESET}")
-                # continue with the remainder
-                line = line[split_point:].strip()
-            if line:
-                content_lines.append(f"{GREEN}{line}{RESET}")
+            for part in _wrap_line(line):
+                content_lines.append(f"{GREEN}{part}{RESET}")
     else:
         content_lines.append(f"{GREEN}None{RESET}")
 
-    def print_line(content=""):
+    def format_line(content=""):
         display_length = get_display_width(content)
-        padding = width - display_length - 1  # Changed to -1 to account for the single space after │
-        print(f"│ {content}{' ' * padding}│")
+        padding = max(BOX_WIDTH - display_length - 1, 0)  # -1 accounts for the single space after │
+        return f"│ {content}{_SPACES[:padding]}│"
 
-    # Box drawing
-    h_line = "─" * width
-    print(f"\n{BOLD}┌{h_line}┐{RESET}")
-    # print content lines
+    # Box drawing, collected into one buffer and written with a single call
+    top, separator, bottom = _TOOL_BORDERS
+    out = [top]
+    # content lines
     for idx, line in enumerate(content_lines):
-        print_line(line)
+        out.append(format_line(line))
         # Add separators as needed
         if idx == 0 or idx == 1 + len(arguments):
-            print(f"{BOLD}├{h_line}┤{RESET}")
-    print(f"{BOLD}└{h_line}┘{RESET}\n")
+            out.append(separator)
+    out.append(bottom)
+    _write_box(out)
 
 
 def print_role_response(user_message: str, type: str = "agent"):
     """
     Prints a nicely formatted output for different role responses (agent/user).
     """
-    # ANSI color codes
-    PURPLE = '\033[95m'    # For agent text
-    RED = '\033[91m'       # For agent box
-    GREEN = '\033[92m'     # For user box
-    WHITE = '\033[97m'     # For message text
-    RESET = '\033[0m'
-    BOLD = '\033[1m'
-    
-    width = 96
-
-    if type.lower() == "agent":
-        emoji = "🤖"
-        box_color = RED
-        header = "AGENT RESPONSE:"
-    else:
-        emoji = "👤"
-        box_color = GREEN
-        header = "USER MESSAGE:"
+    header, left, right, (top, separator, bottom) = _AGENT_BOX if type.lower() == "agent" else _USER_BOX
 
     # Split long lines
-    content_lines = [f"{emoji} {WHITE}{header}{RESET}"]
+    content_lines = [header]
     # Replace double newlines with a special marker
     message_lines = user_message.replace('\n\n', '\n<DOUBLE_BREAK>\n').splitlines()
     
@@ -125,32 +148,21 @@ def print_role_response(user_message: str, type: str = "agent"):
             content_lines.append('')  # Add empty line for double breaks
             continue
         
-        line_stripped = line
-        # split if line is too long
-        while get_display_width(line_stripped) > 90:
-            split_point = 80
-            while split_point > 0 and split_point < len(line_stripped) and line_stripped[split_point] != ' ':
-                split_point -= 1
-            if split_point == 0:
-                split_point = 80
-            content_lines.append(f"{WHITE}{line_stripped[:split_point]}{RESET}")
-            line_stripped = line_stripped[split_point:].strip()
-        if line_stripped:
-            content_lines.append(f"{WHITE}{line_stripped}{RESET}")
-
-    def print_line(content=""):
+        for part in _wrap_line(line):
+            content_lines.append(f"{WHITE}{part}{RESET}")
+
+    def format_line(content=""):
         display_length = get_display_width(content)
-        padding = width - display_length - 1  # Changed to -1 to account for the single space after │
-        print(f"{box_color}│{RESET} {content}{' ' * padding}{box_color}│{RESET}")
-
-    h_line = "─" * width
-    # Print the box
-    ensure_min_time_gap()
-    print(f"\n{BOLD}{box_color}┌{h_line}┐{RESET}")
-    # print the header
-    print_line(content_lines[0])
-    print(f"{BOLD}{box_color}├{h_line}┤{RESET}")
-    # print the message lines
+        padding = max(BOX_WIDTH - display_length - 1, 0)  # -1 accounts for the single space after │
+        return f"{left}{content}{_SPACES[:padding]}{right}"
+
+    # Build the box, collected into one buffer and written with a single call
+    out = [top]
+    # the header
+    out.append(format_line(content_lines[0]))
+    out.append(separator)
+    # the message lines
     for line in content_lines[1:]:
-        print_line(line)
-    print(f"{BOLD}{box_color}└{h_line}┘{RESET}\n")
+        out.append(format_line(line))
+    out.append(bottom)
+    _write_box(out)
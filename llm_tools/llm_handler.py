@@ -1,24 +1,72 @@
 # llm_tools/llm_handler.py
-from typing import Optional, Dict, Any, Callable, List
+from typing import Optional, Dict, Any, Callable, List, Iterator
 from llm_api.base_api import BaseLLMAPI
+from llm_api.json_utils import dumps
+from llm_api.retry import retry_call
 from llm_tools.message_handler import MessageHandler
-from concurrent.futures import ThreadPoolExecutor
-import json
-import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from operator import itemgetter
+import logging
+
+log = logging.getLogger(__name__)
+
+_tool_call_fields = itemgetter("id", "name", "input")
 
 class LLMHandler:
     """
     High-level interface for interacting with the LLM API, handling messages and tools execution.
     """
-    def __init__(self, api: BaseLLMAPI):
+    def __init__(self, api: BaseLLMAPI, functions: Optional[List[Callable]] = None, tools: Optional[List[Dict]] = None,
+                 system_prompt: Optional[str] = None, batch_functions: Optional[Dict[str, Callable]] = None,
+                 use_batch_api: bool = False, max_retries: int = 4):
+        """
+        :param api: The provider to talk to.
+        :param functions: Functions to register as tools; same as calling `register_functions`.
+        :param tools: Tool definitions in the provider's format; same as calling `set_tools`.
+        :param system_prompt: Same as calling `set_system_prompt`.
+        :param batch_functions: Batch implementations by tool name; same as calling `register_batch_functions`.
+        :param use_batch_api: Send every model turn through the provider's `generate_batch`
+                              (its discounted Batch API, where available) instead of `generate`.
+                              Turns can then take minutes to hours; meant for offline runs.
+        :param max_retries: How often a model turn is retried, with exponential backoff, after a
+                            rate limit, server error or dropped connection. Messages and tool
+                            results recorded earlier in the interaction are kept.
+        """
         self.api = api
+        self.use_batch_api = use_batch_api
+        self.max_retries = max_retries
         self.handler = MessageHandler()
         self.tools = None
+        self._tools_by_name: Dict[str, Dict] = {}
         self.registered_functions: Dict[str, Callable] = {}
+        self.batch_functions: Dict[str, Callable] = {}
         self.processed_tool_ids = set()
+        # Worker pool for tool calls, created on first use and kept for the handler's lifetime
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        if functions:
+            self.register_functions(functions)
+        if batch_functions:
+            self.register_batch_functions(batch_functions)
+        if tools is not None:
+            self.set_tools(tools)
+        if system_prompt is not None:
+            self.set_system_prompt(system_prompt)
+
+    def close(self):
+        """Shut down the tool worker threads. The handler can still be used afterwards."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
 
     def set_tools(self, tools: List[Dict]):
         self.tools = tools
+        # OpenAI-style tools nest the definition under "function"; Anthropic-style ones do not
+        self._tools_by_name = {t.get("function", t)["name"]: t for t in tools or []}
+
+    def get_tool(self, name: str) -> Optional[Dict]:
+        """Return the tool definition registered under `name`, or None."""
+        return self._tools_by_name.get(name)
 
     def register_function(self, func: Callable):
         self.registered_functions[func.__name__] = func
@@ -27,6 +75,18 @@ class LLMHandler:
         for func in functions:
             self.register_function(func)
 
+    def register_batch_function(self, tool_name: str, batch_func: Callable):
+        """
+        Register a batch implementation for the tool `tool_name`. When one model reply calls that
+        tool several times, `batch_func` is called once with the list of call arguments and must
+        return one result per call, in order. If it raises, the calls run one by one instead.
+        """
+        self.batch_functions[tool_name] = batch_func
+
+    def register_batch_functions(self, batch_functions: Dict[str, Callable]):
+        for tool_name, batch_func in batch_functions.items():
+            self.register_batch_function(tool_name, batch_func)
+
     def set_model(self, api: BaseLLMAPI):
         self.api = api
         self.processed_tool_ids.clear()
@@ -38,6 +98,42 @@ class LLMHandler:
         self.handler.append_user_text(user_text)
         return self._process_interaction()
 
+    def send_user_message_stream(self, user_text: str) -> Iterator[str]:
+        """
+        Like `send_user_message`, but yields the model's text as it is generated.
+        Tool calls are run between model turns exactly as in `send_user_message`, and a turn
+        that fails before its first event is retried the same way. Not available with
+        `use_batch_api`, since batch results only arrive once they are complete.
+        """
+        if self.use_batch_api:
+            raise ValueError("Streaming is not available with use_batch_api=True; use send_user_message instead.")
+        self.handler.append_user_text(user_text)
+        while True:
+            response = None
+            try:
+                event, stream = retry_call(self._open_stream, self.handler.get_messages(), attempts=self.max_retries + 1)
+                while event is not None:
+                    if event["type"] == "text_delta":
+                        yield event["text"]
+                    elif event["type"] == "response":
+                        response = event["response"]
+                    event = next(stream, None)
+            except Exception as e:
+                log.error("Error during API call: %s", e)
+                log.debug("API call traceback", exc_info=True)
+                raise
+            if response is None:
+                raise RuntimeError(f"{type(self.api).__name__} stream ended without a final response")
+
+            content = response.get("content", [])
+            tool_uses = [c for c in content if c.get("type") == "tool_use"]
+            if tool_uses:
+                self._run_tool_calls(content, tool_uses)
+                continue  # After processing tools, re-generate
+
+            if response.get("stop_reason", "stop_sequence") != "tool_use":
+                return
+
     def send_user_image_and_text(self, image_path: str, text_comment: Optional[str] = None) -> str:
         self.handler.append_image("user", image_path, text_comment)
         return self._process_interaction()
@@ -46,10 +142,11 @@ class LLMHandler:
         while True:
             messages = self.handler.get_messages()
             try:
-                response = self.api.generate(messages, self.tools)
+                response = retry_call(self._generate, messages, attempts=self.max_retries + 1)
             except Exception as e:
-                print(f"Error during API call: {e}")
-                print(traceback.format_exc())
+                log.error("Error during API call: %s", e)
+                # The traceback is only formatted when debug logging is on; the re-raise carries it anyway
+                log.debug("API call traceback", exc_info=True)
                 raise
 
             content = response.get("content", [])
@@ -59,34 +156,87 @@ class LLMHandler:
             tool_uses = [c for c in content if c.get("type") == "tool_use"]
 
             if tool_uses:
-                # Append assistant message containing tool_use
-                self.handler.append_message("assistant", content)
-
-                # Process tool calls
-                tool_calls_to_process = [tc for tc in tool_uses if tc["id"] not in self.processed_tool_ids]
-
-                with ThreadPoolExecutor() as executor:
-                    futures = []
-                    for tool_call in tool_calls_to_process:
-                        tool_id = tool_call["id"]
-                        tool_name = tool_call["name"]
-                        tool_input = tool_call["input"]
-                        futures.append((tool_id, executor.submit(self._execute_tool, tool_id, tool_name, tool_input)))
-
-                    for tool_id, future in futures:
-                        result_block = future.result()
-                        self.processed_tool_ids.add(tool_id)
-                        result_str = json.dumps(result_block["data"]) if isinstance(result_block["data"], dict) else str(result_block["data"])
-                        self.handler.append_message("tool", {
-                            "tool_call_id": tool_id,
-                            "content": result_str
-                        })
-
+                self._run_tool_calls(content, tool_uses)
                 continue  # After processing tools, re-generate
 
             if stop_reason != "tool_use":
                 return " ".join(block.get("text","") for block in text_blocks if block.get("text"))
 
+    def _generate(self, messages: List[Dict]) -> Dict:
+        if self.use_batch_api:
+            return self.api.generate_batch([messages], self.tools)[0]
+        return self.api.generate(messages, self.tools)
+
+    def _open_stream(self, messages: List[Dict]) -> tuple:
+        """
+        Start a streamed turn and return its first event (None for an empty stream) with the
+        rest of the stream. The request is only sent on the first `next`, so this is the part
+        that can be retried; once text has been yielded, a failure cannot be replayed.
+        """
+        stream = iter(self.api.generate_stream(messages, self.tools))
+        return next(stream, None), stream
+
+    def _run_tool_calls(self, content: List[Dict], tool_uses: List[Dict]):
+        """Record the assistant's tool-use turn, run its new tool calls and append their results."""
+        # Append assistant message containing tool_use
+        self.handler.append_message("assistant", content)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=8)
+        submit = self._executor.submit
+        processed = self.processed_tool_ids
+
+        # Process tool calls that have not been run yet, grouping repeated calls to tools
+        # that have a batch implementation
+        singles = []
+        groups: Dict[str, List] = {}
+        for tool_call in tool_uses:
+            call = _tool_call_fields(tool_call)
+            if call[0] in processed:
+                continue
+            if call[1] in self.batch_functions:
+                groups.setdefault(call[1], []).append(call)
+            else:
+                singles.append(call)
+
+        futures = []
+        for tool_name, calls in groups.items():
+            if len(calls) > 1:
+                futures.append(submit(self._execute_tool_batch, tool_name, calls))
+            else:
+                singles.extend(calls)
+        for tool_id, tool_name, tool_input in singles:
+            futures.append(submit(self._execute_tool, tool_id, tool_name, tool_input))
+
+        # Record results as they finish; each one carries its own tool_call_id,
+        # so a fast tool does not wait behind a slow one submitted before it
+        for future in as_completed(futures):
+            result = future.result()
+            for result_block in result if isinstance(result, list) else [result]:
+                tool_id = result_block["tool_use_id"]
+                self.processed_tool_ids.add(tool_id)
+                result_str = dumps(result_block["data"]) if isinstance(result_block["data"], dict) else str(result_block["data"])
+                self.handler.append_message("tool", {
+                    "tool_call_id": tool_id,
+                    "content": result_str
+                })
+
+    def _execute_tool_batch(self, tool_name: str, calls: List[tuple]) -> List[Dict]:
+        try:
+            results = self.batch_functions[tool_name]([tool_input for _, _, tool_input in calls])
+            if len(results) != len(calls):
+                raise ValueError(f"Batch function for {tool_name} returned {len(results)} results for {len(calls)} calls")
+        except Exception:
+            log.debug("Batch call of %s failed, running the calls one by one", tool_name, exc_info=True)
+            return [self._execute_tool(tool_id, name, tool_input) for tool_id, name, tool_input in calls]
+
+        blocks = []
+        for (tool_id, _, _), result in zip(calls, results):
+            if not isinstance(result, dict):
+                result = {"result": str(result)}
+            blocks.append({"type":"tool_result","tool_use_id":tool_id,"data":result})
+        return blocks
+
     def _execute_tool(self, tool_id: str, tool_name: str, tool_input: Dict[str, Any]) -> Dict:
         func = self.registered_functions.get(tool_name)
         if not func:
@@ -1,7 +1,28 @@
 # llm_tools/message_handler.py
 import base64
 import mimetypes
-from typing import List, Dict, Union
+import mmap
+import os
+from functools import lru_cache
+from typing import List, Dict, Union, Tuple
+
+@lru_cache(maxsize=64)
+def _encode_image_cached(image_path: str, mtime_ns: int) -> Tuple[str, str]:
+    """
+    Return (media_type, base64 data) for an image file. Keyed on the modification time as well
+    as the path, so an image that is re-referenced is only read and encoded again if it changed.
+    """
+    with open(image_path, "rb") as f:
+        # Encode straight from a memory map instead of reading the file into a bytes copy first
+        if os.fstat(f.fileno()).st_size == 0:
+            encoded = ""  # mmap cannot map an empty file
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                encoded = base64.b64encode(mm).decode("ascii")
+    mime_type, _ = mimetypes.guess_type(image_path)
+    if not mime_type:
+        mime_type = "image/jpeg"
+    return mime_type, encoded
 
 class MessageHandler:
     """
@@ -9,14 +30,16 @@ class MessageHandler:
     """
     def __init__(self):
         self.messages = []
+        # Index of the system message in self.messages, or None if there is none yet
+        self._system_idx = None
 
     def set_system_prompt(self, system_prompt: str):
         # Insert or update system message
-        for msg in self.messages:
-            if msg.get("role") == "system":
-                msg["content"] = [{"type":"text","text":system_prompt}]
-                return
+        if self._system_idx is not None:
+            self.messages[self._system_idx]["content"] = [{"type":"text","text":system_prompt}]
+            return
         self.messages.insert(0, {"role":"system","content":[{"type":"text","text":system_prompt}]})
+        self._system_idx = 0
 
     def append_message(self, role: str, content_blocks: Union[str, Dict, List[Dict]]):
         if role == "tool":
@@ -32,6 +55,11 @@ class MessageHandler:
             else:
                 raise ValueError("Tool messages must be dict with 'tool_call_id' and 'content' keys.")
         
+        if type(content_blocks) is list and content_blocks and all(isinstance(b, dict) and "type" in b for b in content_blocks):
+            # Already canonical (e.g. content returned by the API layer): store the list as-is
+            self.messages.append({"role": role, "content": content_blocks})
+            return
+
         if isinstance(content_blocks, str):
             content_blocks = [{"type":"text","text":content_blocks}]
         elif isinstance(content_blocks, dict):
@@ -65,16 +93,12 @@ class MessageHandler:
         self.append_message(role, blocks)
 
     def encode_image_to_base64(self, image_path: str):
-        with open(image_path, "rb") as f:
-            img_bytes = f.read()
-        encoded = base64.b64encode(img_bytes).decode("utf-8")
-        mime_type, _ = mimetypes.guess_type(image_path)
-        if not mime_type:
-            mime_type = "image/jpeg"
+        mime_type, encoded = _encode_image_cached(image_path, os.stat(image_path).st_mtime_ns)
         return {"media_type": mime_type, "data": encoded}
 
     def get_messages(self) -> List[Dict]:
         return self.messages
 
     def reset(self):
-        self.messages = []
\ No newline at end of file
+        self.messages = []
+        self._system_idx = None
\ No newline at end of file
@@ -1,115 +1,221 @@
 # main.py
-import traceback
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from tool_converter import ToolConverter
+from llm_api.json_utils import dumps, loads
 from llm_tools.llm_handler import LLMHandler
 from llm_api.openai_api import OpenAIAPI
 from llm_api.anthropic_api import AnthropicAPI
 from llm_api.groq_api import GroqAPI
 from llm_api.gemini_api import GeminiAPI
-from functions.math_tools import subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number
+from functions.math_tools import subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number, math_batch, BATCH_FUNCTIONS
 
-if __name__ == "__main__":
-    # Instantiate the ToolConverter
-    converter = ToolConverter()
-    functions = [subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number]
-    schemas = converter.generate_schemas(functions)
-    print(schemas)
+functions = [subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number, math_batch]
 
-    system_prompt = """You are a helpful assistant that can perform mathematical operations.
+system_prompt = """You are a helpful assistant that can perform mathematical operations.
 """
 
-    # Flag to choose which LLM to run:
-    run_openai = True
-    run_anthropic = True
-    run_groq = True
-    run_gemini = True
+# User prompts sent to the providers
+PROMPT_FULL_TEST = (
+    "start by testing some of the tools and report back your findings. You can choose the numbers you want to use. "
+    "call some in parallel first. then call some in series to compile some good math problems that you will present. "
+    "We are testing the following functions: subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number. "
+    "Make a presentation about some extremely hard mathematical problems. Your final response should be this as then conversation will end."
+)
+PROMPT_GEMINI = (
+    "We are testing the following functions: subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number. Call as many functions as you can. "
+    "Make a presentation about some extremely hard mathematical problems. Your final response should show these results."
+)
+PROMPT_EXPLAIN_2 = sys.intern("explain what you did in 2 sentences")
+PROMPT_EXPLAIN_5 = sys.intern("explain what you did in 5 sentences")
 
-    CONFIRMATION_PRINT = True
+CONFIRMATION_PRINT = True
 
-    try:
-        if run_gemini:
-            print("--------------------------------")
-            # Gemini test
-            gemini_client = GeminiAPI(model_name="gemini-2.0-flash-exp", VERBOSE=False, CONFIRMATION_PRINT=CONFIRMATION_PRINT, tools_schema=schemas["gemini"])
-            llm = LLMHandler(gemini_client)
-            llm.register_functions(functions)
-            llm.set_tools(schemas["gemini"])
-            llm.set_system_prompt(system_prompt)
-
-            print("Gemini start")
-            response = llm.send_user_message(
-                "We are testing the following functions: subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number. Call as many functions as you can. "
-                "Make a presentation about some extremely hard mathematical problems. Your final response should show these results."
-            )
-            print("Gemini response:", response)
+log = logging.getLogger(__name__)
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        print(f"Full error breakdown: {traceback.format_exc()}")
+# Set from --batch: send every model turn through the providers' Batch APIs
+USE_BATCH_API = False
+# Set from --stream: write response text to stdout as it is generated
+STREAM_OUTPUT = False
+
+CACHE_DIR = os.path.expanduser("~/.cache/agent_nexus")
+RESPONSE_CACHE_DIR = os.path.join(CACHE_DIR, "responses")
 
-    try:
-        if run_groq:
-            print("--------------------------------")
-            # Groq test
-            groq_client = GroqAPI(model_name="llama-3.3-70b-specdec", VERBOSE=False, CONFIRMATION_PRINT=CONFIRMATION_PRINT)
-            llm = LLMHandler(groq_client)
-            llm.register_functions(functions)
-            llm.set_tools(schemas["groq"])
-            llm.set_system_prompt(system_prompt)
-            response = llm.send_user_message(
-                "start by testing some of the tools and report back your findings. You can choose the numbers you want to use. "
-                "call some in parallel first. then call some in series to compile some good math problems that you will present. "
-                "We are testing the following functions: subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number. "
-                "Make a presentation about some extremely hard mathematical problems. Your final response should be this as then conversation will end."
-            )
-            print("Groq response:", response)
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        print(f"Full error breakdown: {traceback.format_exc()}")
 
+def cached_send(llm: LLMHandler, user_msg: str) -> str:
+    """
+    Same as `llm.send_user_message(user_msg)`, but answers are stored on disk and replayed when
+    the provider, model, tools and the whole conversation so far are identical. On a hit the
+    stored messages of that turn (tool calls included) are appended to the conversation, so
+    follow-up questions continue from the same state. Only safe for side-effect free tools.
+    """
+    api = llm.api
+    model = getattr(api, "model_name", None) or getattr(api, "model", "")
+    payload = dumps(
+        {"provider": type(api).__name__, "model": str(model), "tools": llm.tools,
+         "messages": llm.handler.get_messages(), "user": user_msg},
+        sort_keys=True,
+        default=str,
+    )
+    key = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    path = os.path.join(RESPONSE_CACHE_DIR, f"{key}.json")
+
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            entry = loads(f.read())
+        llm.handler.messages.extend(entry["messages"])
+        log.info("%s response served from disk cache", type(api).__name__)
+        return entry["response"]
+
+    start = len(llm.handler.get_messages())
+    if STREAM_OUTPUT:
+        parts = []
+        for token in llm.send_user_message_stream(user_msg):
+            sys.stdout.write(token)
+            sys.stdout.flush()
+            parts.append(token)
+        sys.stdout.write("\n")
+        response = "".join(parts)
+    else:
+        response = llm.send_user_message(user_msg)
+    entry = {"response": response, "messages": llm.handler.get_messages()[start:]}
+
+    os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(dumps(entry, default=str))
+    os.replace(tmp_path, path)
+    return response
+
+
+def send_and_print(llm: LLMHandler, label: str, user_msg: str):
+    """Send one message and print the answer. A failure is reported without skipping later calls."""
     try:
-        if run_openai:
-            print("--------------------------------")
-            # OpenAI test
-            openai_client = OpenAIAPI(model_name="gpt-4o", VERBOSE=False, CONFIRMATION_PRINT=CONFIRMATION_PRINT)
-            llm = LLMHandler(openai_client)
-            llm.register_functions(functions)
-            llm.set_tools(schemas["openai"])
-            llm.set_system_prompt(system_prompt)
-            print("OpenAI start")
-            response = llm.send_user_message(
-                "start by testing some of the tools and report back your findings. You can choose the numbers you want to use. "
-                "call some in parallel first. then call some in series to compile some good math problems that you will present. "
-                "We are testing the following functions: subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number. "
-                "Make a presentation about some extremely hard mathematical problems. Your final response should be this as then conversation will end."
-            )
-            print("OpenAI response:", response)
-            response = llm.send_user_message("explain what you did in 2 sentences") 
-            print("OpenAI response:", response)
-            response = llm.send_user_message("explain what you did in 5 sentences")
-            print("OpenAI response:", response)
-            print(llm.handler.messages)
+        response = cached_send(llm, user_msg)
+        log.info("%s response: %s", label, response)
     except Exception as e:
-        print(f"An error occurred: {e}")
-        print(f"Full error breakdown: {traceback.format_exc()}")
+        log.error("An error occurred: %s", e)
+        log.debug("Full error breakdown:", exc_info=True)
+
+
+# One entry per provider test. "schema_kwarg" names the constructor argument that takes the
+# tool schemas, for providers that convert them when the client is built. "followup_model"
+# answers every prompt after the first one, which are short recaps without tool calls.
+PROVIDERS = [
+    {
+        "label": "Gemini",
+        "api": GeminiAPI,
+        "kwargs": {"model_name": "gemini-2.0-flash-exp"},
+        "schemas": "gemini",
+        "schema_kwarg": "tools_schema",
+        "prompts": [PROMPT_GEMINI],
+    },
+    {
+        "label": "Groq",
+        "api": GroqAPI,
+        "kwargs": {"model_name": "llama-3.3-70b-specdec"},
+        "schemas": "groq",
+        "prompts": [PROMPT_FULL_TEST],
+    },
+    {
+        "label": "OpenAI",
+        "api": OpenAIAPI,
+        "kwargs": {"model_name": "gpt-4o"},
+        "schemas": "openai",
+        "followup_model": "gpt-4o-mini",
+        "prompts": [PROMPT_FULL_TEST, PROMPT_EXPLAIN_2, PROMPT_EXPLAIN_5],
+    },
+    {
+        "label": "Anthropic",
+        "api": AnthropicAPI,
+        "kwargs": {"model_name": "claude-3-5-sonnet-20240620"},
+        "schemas": "anthropic",
+        "prompts": [PROMPT_FULL_TEST],
+    },
+]
 
+
+def create_client(provider: dict, schemas: Optional[dict] = None, **overrides):
+    kwargs = dict(provider["kwargs"], VERBOSE=False, CONFIRMATION_PRINT=CONFIRMATION_PRINT, **overrides)
+    if provider.get("schema_kwarg"):
+        kwargs[provider["schema_kwarg"]] = schemas[provider["schemas"]]
+    return provider["api"](**kwargs)
+
+
+def run_provider(provider: dict, client_future: Future, schemas: dict):
+    label = provider["label"]
     try:
-        if run_anthropic:
-            print("--------------------------------")
-            # Anthropic test
-            anthropic_client = AnthropicAPI(model_name="claude-3-5-sonnet-20240620", VERBOSE=False, CONFIRMATION_PRINT=CONFIRMATION_PRINT)
-            llm = LLMHandler(anthropic_client)
-            llm.register_functions(functions)
-            llm.set_tools(schemas["anthropic"])
-            llm.set_system_prompt(system_prompt)
-            print("Anthropic start")
-            response = llm.send_user_message(
-                "start by testing some of the tools and report back your findings. You can choose the numbers you want to use. "
-                "call some in parallel first. then call some in series to compile some good math problems that you will present. "
-                "We are testing the following functions: subtract_numbers, add_numbers, multiply_numbers, divide_numbers, square_number, cube_number. "
-                "Make a presentation about some extremely hard mathematical problems. Your final response should be this as then conversation will end."
-            )
-            print("Anthropic response:", response)
+        log.info("--------------------------------")
+        log.info("%s start", label)
+        llm = LLMHandler(client_future.result(), functions=functions, tools=schemas[provider["schemas"]],
+                         system_prompt=system_prompt, batch_functions=BATCH_FUNCTIONS, use_batch_api=USE_BATCH_API)
+        for idx, prompt in enumerate(provider["prompts"]):
+            if idx == 1 and provider.get("followup_model"):
+                # Same conversation, continued on the smaller model; the HTTP pool is shared
+                llm.set_model(create_client(provider, schemas, model_name=provider["followup_model"]))
+            send_and_print(llm, label, prompt)
+        # The repr of the whole conversation is only built when debug logging is on
+        log.debug("%s messages: %s", label, llm.handler.messages)
     except Exception as e:
-        print(f"An error occurred: {e}")
-        print(f"Full error breakdown: {traceback.format_exc()}")
\ No newline at end of file
+        log.error("An error occurred: %s", e)
+        log.debug("Full error breakdown:", exc_info=True)
+
+
+async def run_all(tests: List[Tuple[dict, Future]], schemas: dict):
+    if STREAM_OUTPUT:
+        # Streamed tokens from concurrent providers would interleave on stdout
+        for provider, client_future in tests:
+            await asyncio.to_thread(run_provider, provider, client_future, schemas)
+        return
+    # The provider tests are independent and network-bound, so run them side by side.
+    # Each one catches its own errors, so a failing provider does not cancel the others.
+    await asyncio.gather(*(asyncio.to_thread(run_provider, provider, client_future, schemas)
+                           for provider, client_future in tests),
+                         return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the math tool test against every provider.")
+    parser.add_argument("--batch", action="store_true",
+                        help="submit model turns through the providers' Batch APIs (cheaper, up to 24h per turn)")
+    parser.add_argument("--stream", action="store_true",
+                        help="print responses as they are generated (runs the providers one at a time)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="log debug output: tool schemas, full conversations and tracebacks")
+    args = parser.parse_args()
+    if args.batch and args.stream:
+        parser.error("--batch and --stream cannot be combined: batch results only arrive once complete")
+    logging.basicConfig(level=logging.DEBUG if args.verbose else os.getenv("LOGLEVEL", "INFO"), format="%(message)s")
+    USE_BATCH_API = args.batch
+    STREAM_OUTPUT = args.stream
+
+    # Providers to run:
+    enabled = {"gemini": True, "groq": True, "openai": True, "anthropic": True}
+    providers = [provider for provider in PROVIDERS if enabled[provider["schemas"]]]
+
+    # Set up the provider clients in the background while the tool schemas are generated.
+    # Construction errors (e.g. a missing API key) surface in that provider's test.
+    pool = ThreadPoolExecutor(max_workers=4)
+    client_futures = {}
+    for provider in providers:
+        if not provider.get("schema_kwarg"):
+            client_futures[provider["label"]] = pool.submit(create_client, provider)
+
+    # Instantiate the ToolConverter
+    converter = ToolConverter(cache_dir=CACHE_DIR)
+    schemas = converter.generate_schemas(functions)
+    log.debug("Tool schemas: %s", schemas)
+
+    # Clients that convert the tool schemas when they are built can only start now
+    for provider in providers:
+        if provider.get("schema_kwarg"):
+            client_futures[provider["label"]] = pool.submit(create_client, provider, schemas)
+
+    asyncio.run(run_all([(provider, client_futures[provider["label"]]) for provider in providers], schemas))
+    pool.shutdown()
@@ -1,32 +1,425 @@
 # tool_converter.py 
+import ast
+import asyncio
+import dis
+import functools
+import hashlib
 import inspect
 import json
-from typing import List, Callable, Dict
-from openai import OpenAI
+import linecache
+import os
+import re
+import sqlite3
+import textwrap
+import threading
+import types
+import typing
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Callable, Dict, Optional, Literal, Union
+from llm_api.base_api import BaseLLMAPI
+from llm_api.json_utils import dumps, loads
+from llm_api.rate_limit import RateLimiter
+from llm_api.retry import aretry_call, retry_call
 from concurrent.futures import ThreadPoolExecutor
 
+# The OpenAI SDK (with httpx and pydantic) is only imported once a client is actually needed
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
+
+# OpenAI client shared by every ToolConverter created without one
+_DEFAULT_CLIENT: Optional["OpenAI"] = None
+_default_client_lock = threading.Lock()
+
+
+def _default_client() -> "OpenAI":
+    """Create the shared client on first use, on the same keep-alive pool as the provider APIs."""
+    global _DEFAULT_CLIENT
+    if _DEFAULT_CLIENT is None:
+        with _default_client_lock:
+            if _DEFAULT_CLIENT is None:
+                from openai import OpenAI
+                _DEFAULT_CLIENT = OpenAI(http_client=BaseLLMAPI.shared_http_client())
+    return _DEFAULT_CLIENT
+
+
+# Instructions for the schema model: this header, the examples and the footer
+_PROMPT_HEADER = (
+    "(\"\"\"### JSON Schema Generator\n"
+    "    Your primary role is to convert provided function details into JSON schemas. The schemas should be clear, structured, and follow a specific format.\n\n"
+    "    ### Schema Structure:\n"
+    "    Each schema must start with a `\"type\": \"function\"` key. The function details should be nested under a `\"function\"` key.\n\n"
+    "    ### Schema Format:\n"
+    "    - **name**: The function's name.\n"
+    "    - **description**: A brief description of what the function does.\n"
+    "    - **strict**: A required key set to `false`.\n"
+    "    - **parameters**: An object detailing the parameters the function accepts.\n"
+    "      - **type**: Always `\"object\"`.\n"
+    "      - **properties**: An object where each key is a parameter name and its value is an object with `\"type\"` and `\"description\"`.\n"
+    "      - **required**: An array of parameter names that are required.\n"
+    "      - **additionalProperties**: Must be set to `false`.\n\n"
+    "    ### Examples:\n"
+)
+_PROMPT_FOOTER = (
+    "    ### Requirements:\n\n"
+    "    1.\tUse exact naming conventions and parameter names from the provided function.\n"
+    "    2.\tEnsure the schema is a valid JSON object.\n"
+    "    3.\tMaintain the specified format and structure in your response.\n\n"
+    "    The aim is to provide users with a JSON schema that precisely matches the functionality of the given function, aiding in their software development projects.\n\n"
+    "    You should concentrate on defining each function’s name, description, parameters, and required fields in a JSON format, adhering to the structure shown in these examples. The aim is to provide users with a JSON schema that precisely matches the functionality of the given function. You’re not tasked with creating Python schemas but rather converting the function details into the correct JSON schema format.\n"
+    "    Your primary role is to convert provided function details into JSON schemas. The schemas should be clear, structured, and follow a specific format.\n\"\"\")"
+)
+# The example schemas are data, kept in a JSON file next to this module
+with open(Path(__file__).with_name("schema_examples.json"), "r", encoding="utf-8") as _f:
+    _EXAMPLES = loads(_f.read())
+
+
+def _format_example(example: Dict) -> str:
+    heading = "".join(f"    {line}\n" for line in example["heading"].splitlines())
+    schema = json.dumps(example["schema"], indent=2, ensure_ascii=False).replace("\n", "\n    ")
+    return f"{heading}    ```json\n    {schema}\n    ```\n\n"
+
+
+# Assembled once, so it is byte-identical across requests and OpenAI's automatic prompt caching
+# can reuse the prefix (it applies once a prompt exceeds 1024 tokens)
+_SYSTEM_PROMPT = _PROMPT_HEADER + "".join(_format_example(example) for example in _EXAMPLES) + _PROMPT_FOOTER
+_SYSTEM_MESSAGE = {"role": "system", "content": _SYSTEM_PROMPT}
+# Changes whenever the instructions do, so cached schemas from older instructions are not reused
+_SYSTEM_PROMPT_DIGEST = hashlib.blake2b(_SYSTEM_PROMPT.encode("utf-8"), digest_size=8).hexdigest()
+# Part of the schema set cache key. Bump it whenever the introspected schemas or the converted
+# Anthropic/Gemini output change shape, since neither is covered by the prompt digest
+_SCHEMA_FORMAT_VERSION = "2"
+
+# Shape of the schema the model must answer with, passed as its response format
+_TOOL_META_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string", "enum": ["function"]},
+        "function": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "description": {"type": "string"},
+                "strict": {"type": "boolean"},
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "type": {"type": "string", "enum": ["object"]},
+                        # Parameter name -> JSON schema of that parameter
+                        "properties": {"type": "object"},
+                        "required": {"type": "array", "items": {"type": "string"}},
+                        "additionalProperties": {"type": "boolean"}
+                    },
+                    "required": ["type", "properties", "required", "additionalProperties"]
+                }
+            },
+            "required": ["name", "description", "strict", "parameters"]
+        }
+    },
+    "required": ["type", "function"]
+}
+
+# Most distinct tool lists whose Anthropic and Gemini versions a converter keeps
+_CONVERSION_MEMO_SIZE = 256
+
+# Request fields that are the same for every schema; requests share these objects, never mutate them
+_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "openai_tool", "strict": False, "schema": _TOOL_META_SCHEMA}
+}
+_SAMPLING_KWARGS = {"top_p": 1, "frequency_penalty": 0, "presence_penalty": 0}
+
+# JSON schema types of the annotations the introspection path understands
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+_ARRAY_ORIGINS = (list, tuple, set, frozenset)
+_UNION_ORIGINS = (Union, getattr(types, "UnionType", Union))
+_DOC_SECTION_RE = re.compile(r"^(Args|Arguments|Parameters|Returns?|Yields?|Raises|Examples?|Notes?):\s*$")
+_DOC_PARAM_RE = re.compile(r"^(\w+)\s*(?:\([^)]*\))?\s*:\s*(.*)$")
+
+
+def _code_end_line(code: types.CodeType) -> int:
+    """Last source line covered by a code object's instructions, nested functions included."""
+    end = code.co_firstlineno
+    for instruction in dis.get_instructions(code):
+        positions = instruction.positions
+        if positions and positions.end_lineno:
+            end = max(end, positions.end_lineno)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            end = max(end, _code_end_line(const))
+    return end
+
+
+def _function_source(code: types.CodeType) -> str:
+    """
+    Source of a function, sliced from the cached lines of its file using the line range of its
+    bytecode. Unlike inspect.getsource this does not run the tokenizer over the module.
+    Comments after the last statement are not included. A body whose last statement has no
+    bytecode (e.g. a function that is only a docstring) goes through inspect.getsource instead.
+
+    >>> def describe(x):
+    ...     "Describe x."
+    >>> print(_function_source(describe.__code__), end="")
+    def describe(x):
+        "Describe x."
+    """
+    # Instruction positions exist from Python 3.11 on
+    if not hasattr(dis.Instruction, "positions"):
+        return inspect.getsource(code)
+    lines = linecache.getlines(code.co_filename)
+    start = code.co_firstlineno - 1
+    end = _code_end_line(code)
+    if not lines or end > len(lines):
+        return inspect.getsource(code)
+    # The next code line must not be indented under the def, or the slice stops inside the body
+    def_indent = len(lines[start]) - len(lines[start].lstrip())
+    for line in lines[end:]:
+        stripped = line.strip()
+        if stripped and not stripped.startswith("#"):
+            if len(line) - len(line.lstrip()) > def_indent:
+                return inspect.getsource(code)
+            break
+    return "".join(lines[start:end])
+
+
+def _normalize_indent(source: str) -> str:
+    # Removes the indentation all lines share; blank lines do not count towards it
+    return textwrap.dedent(source)
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_source(code: types.CodeType) -> str:
+    """
+    Normalized source of the function owning `code`. Keyed on the code object, so every function
+    object sharing it (e.g. tools re-registered for each conversation) reuses one lookup.
+    """
+    try:
+        source = _function_source(code)
+    except Exception:
+        source = inspect.getsource(code)
+    return _normalize_indent(source)
+
+
+@functools.lru_cache(maxsize=1024)
+def _canonical_source(function_string: str) -> str:
+    """
+    The function source re-rendered from its AST, so copies that differ only in comments, line
+    breaks, spacing or quote style share one cache entry. Names, annotations, defaults and
+    docstrings all survive, so anything that can change the schema still changes the key.
+    """
+    try:
+        return ast.unparse(ast.parse(function_string))
+    except (SyntaxError, ValueError):
+        return function_string
+
+
+def _schema_error(text: str) -> Optional[str]:
+    """What is wrong with a generated OpenAI tool schema, or None if it has the expected shape."""
+    if not text:
+        return "the output is empty"
+    try:
+        schema = loads(text)
+    except ValueError as e:
+        return f"the output is not valid JSON ({e})"
+    return _parsed_schema_error(schema)
+
+
+def _parsed_schema_error(schema) -> Optional[str]:
+    """Same as `_schema_error`, for a schema that is already parsed."""
+    if not isinstance(schema, dict) or schema.get("type") != "function":
+        return 'the root must be an object with "type": "function"'
+    function = schema.get("function")
+    if not isinstance(function, dict):
+        return 'the function details must be an object under "function"'
+    for field in ("name", "description"):
+        if not isinstance(function.get(field), str):
+            return f'"function.{field}" must be a string'
+    parameters = function.get("parameters")
+    if not isinstance(parameters, dict) or parameters.get("type") != "object":
+        return '"function.parameters" must be an object with "type": "object"'
+    if not isinstance(parameters.get("properties", {}), dict):
+        return '"function.parameters.properties" must be an object'
+    if not isinstance(parameters.get("required", []), list):
+        return '"function.parameters.required" must be an array'
+    return None
+
+
+def _json_type(annotation) -> Optional[Dict]:
+    """
+    JSON schema of a type annotation, or None if it has no plain JSON equivalent.
+
+    >>> _json_type(Literal["add", "subtract"])
+    {'type': 'string', 'enum': ['add', 'subtract']}
+    >>> _json_type(Literal[1, "x"]) is None
+    True
+    >>> _json_type(typing.Tuple[int, ...])
+    {'type': 'array', 'items': {'type': 'integer'}}
+    >>> _json_type(typing.Tuple[int, str]) is None
+    True
+    """
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin in _ARRAY_ORIGINS:
+        if not args:
+            return {"type": "array"}
+        length = None
+        if origin is tuple:
+            if len(args) == 2 and args[1] is Ellipsis:
+                args = args[:1]
+            elif len(set(args)) == 1:
+                # tuple[T, T] is a fixed-length array of T
+                length = len(args)
+            else:
+                # Each position has its own type, which "items" cannot express
+                return None
+        items = _json_type(args[0])
+        if items is None:
+            return None
+        schema = {"type": "array", "items": items}
+        if length is not None:
+            schema["minItems"] = schema["maxItems"] = length
+        return schema
+    if origin is dict:
+        return {"type": "object"}
+    # An enum is only valid under one type, so mixed literals go to the model instead
+    literal_types = {type(arg) for arg in args}
+    if origin is Literal and len(literal_types) == 1 and literal_types <= _JSON_TYPES.keys():
+        return {"type": _JSON_TYPES[type(args[0])], "enum": list(args)}
+    # pydantic models describe themselves; checked by duck typing so pydantic stays optional.
+    # The tool still receives the argument as a plain dict.
+    if isinstance(annotation, type) and hasattr(annotation, "model_json_schema"):
+        schema = annotation.model_json_schema()
+        # Models referring to other models need $defs, which a single property cannot carry
+        if "$defs" not in schema:
+            schema.pop("title", None)
+            return schema
+    return None
+
+
+def _parse_docstring(doc: str) -> tuple:
+    """
+    Split a Google-style docstring into its description and the descriptions listed under Args.
+    Returns (description, {parameter name: description}).
+    """
+    description, params = [], {}
+    section, current = None, None
+    for line in inspect.cleandoc(doc).splitlines():
+        stripped = line.strip()
+        header = _DOC_SECTION_RE.match(stripped)
+        if header:
+            section, current = header.group(1), None
+            continue
+        if section is None:
+            description.append(stripped)
+        elif section in ("Args", "Arguments", "Parameters") and stripped:
+            match = _DOC_PARAM_RE.match(stripped)
+            if match and match.group(1) not in params:
+                current = match.group(1)
+                params[current] = match.group(2)
+            elif current:
+                # Continuation line of the previous parameter
+                params[current] = f"{params[current]} {stripped}".strip()
+    return " ".join(" ".join(description).split()), params
+
+# The converters below build new wrapper dicts but reference the 'properties' and 'required'
+# objects of the OpenAI schema they are given, so the formats share (and must not mutate) them.
+# The providers only read the schemas; use deep=True on the public converters when that doesn't hold.
+def _json_copy(obj):
+    """Deep copy of a JSON-shaped object; a JSON round trip is much faster than copy.deepcopy here."""
+    return loads(dumps(obj))
+
+
+def _anthropic_tool(function_details: Dict) -> Dict:
+    return {
+        "name": function_details["name"],
+        "description": function_details["description"],
+        "input_schema": {
+            "type": "object",
+            "properties": function_details["parameters"]["properties"],
+            "required": function_details["parameters"].get("required", [])
+        }
+    }
+
+
+def _gemini_tool(function_details: Dict) -> Dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": function_details["name"],
+            "description": function_details["description"],
+            "parameters": {
+                "type": "object",
+                "properties": function_details["parameters"]["properties"],
+                "required": function_details["parameters"].get("required", [])
+            }
+        }
+    }
+
+
 class ToolConverter:
     """
     A utility class designed to convert Python functions into JSON schemas that can be used
     with various LLMs (OpenAI, Anthropic, Gemini, Groq). It:
     - Extracts Python function source code and docstrings.
-    - Uses an OpenAI model to generate a JSON schema describing the function's parameters and return values.
+    - Builds the JSON schema directly from type hints and the docstring where it can, and otherwise
+      uses an OpenAI model to generate one describing the function's parameters and return values.
     - Transforms the resulting OpenAI schema into formats for Anthropic, Gemini, and Groq platforms.
     """
 
-    def __init__(self, indent_size: int = 4, client: OpenAI = None):
+    def __init__(self, indent_size: Optional[int] = None, client: "OpenAI" = None, cache_dir: Optional[str] = None,
+                 cache_path: Optional[str] = None, async_client: "AsyncOpenAI" = None,
+                 rate_limiter: Optional[RateLimiter] = None, model: str = "gpt-4o-mini",
+                 schema_max_tokens: int = 1024, schema_temperature: float = 0.0):
         """
         Initialize the ToolConverter with an optional custom indentation and OpenAI client.
 
         Args:
-            indent_size (int): Number of spaces for JSON indentation, default is 4.
-            client (OpenAI, optional): An OpenAI client instance. If not provided, a new one will be created.
+            indent_size (int, optional): Number of spaces for JSON indentation. Default is None, which
+                emits compact JSON; set it only when the output is meant to be read.
+            client (OpenAI, optional): An OpenAI client instance. If not provided, one client shared by
+                all converters is used, so its connections stay warm across instances.
+            cache_dir (str, optional): Directory where generated schema sets are stored between runs.
+                A set is reused as long as the source of every function, the model and the instructions
+                are unchanged. Defaults to the AGENT_NEXUS_CACHE environment variable; disabled if neither is set.
+            cache_path (str, optional): SQLite file holding the schema of every single function, so a
+                changed set only regenerates the functions that changed. Defaults to a file in
+                cache_dir; without either, schemas are only cached in memory.
+            async_client (AsyncOpenAI, optional): Client for `convert_all`. If not provided, a new one
+                is created for every call.
+            rate_limiter (RateLimiter, optional): Keeps the async requests within the account's
+                requests- and tokens-per-minute limits, so wide fan-outs do not run into 429s.
+            model (str): OpenAI model that writes the schemas, default is "gpt-4o-mini".
+                Part of the per-function cache key, so switching models regenerates the schemas.
+            schema_max_tokens (int): Output token budget per schema, default is 1024; most schemas
+                need well under 500.
+            schema_temperature (float): Sampling temperature, default is 0.0 so the same function
+                gets the same schema.
 
         Example:
             converter = ToolConverter(indent_size=2)
         """
         self.indent_size = indent_size
-        self.client = client if client else OpenAI()
+        self.model = model
+        self.schema_max_tokens = schema_max_tokens
+        self.schema_temperature = schema_temperature
+        self.client = client if client else _default_client()
+        self.async_client = async_client
+        self.rate_limiter = rate_limiter
+        if cache_dir is None and os.getenv("AGENT_NEXUS_CACHE"):
+            cache_dir = os.path.expanduser(os.environ["AGENT_NEXUS_CACHE"])
+        self.cache_dir = cache_dir
+        # generate_schemas results, keyed by the tuple of functions they were generated for
+        self._schemas_memo: Dict[tuple, typing.Mapping[str, List[Dict]]] = {}
+        # _convert_all results, keyed by the ids of the OpenAI tool dicts
+        self._conversion_memo: Dict[tuple, tuple] = {}
+        # create_function_schema results, keyed by _function_cache_key
+        self._cache: Dict[str, str] = {}
+        if cache_path is None and cache_dir:
+            cache_path = os.path.join(cache_dir, "function_schemas.sqlite3")
+        self.cache_path = cache_path
+        self._db: Optional[sqlite3.Connection] = None
+        # Schemas are generated from worker threads; one lock covers the connection and the dict
+        self._cache_lock = threading.Lock()
 
     def _get_function_source(self, func: Callable) -> str:
         """
@@ -39,14 +432,67 @@ class ToolConverter:
         Returns:
             str: The source code of the function with normalized indentation.
         """
-        source = inspect.getsource(func)
-        lines = source.split('\n')
-        if lines:
-            # Deduce indentation from the first line and remove it from all lines
-            first_line_indent = len(lines[0]) - len(lines[0].lstrip())
-            lines = [line[first_line_indent:] if line.startswith(' ' * first_line_indent) else line 
-                     for line in lines]
-        return '\n'.join(lines)
+        code = getattr(func, "__code__", None)
+        if code is None:
+            return _normalize_indent(inspect.getsource(func))
+        return _cached_source(code)
+
+    def _schema_from_introspection(self, func: Callable) -> Optional[Dict]:
+        """
+        Build the OpenAI-style schema of a function from its signature, type hints and docstring,
+        without calling the model.
+
+        Args:
+            func (Callable): The Python function to describe.
+
+        Returns:
+            Dict: The schema, or None if the function has no docstring, an unannotated parameter,
+                  *args/**kwargs, or a type without a plain JSON equivalent. Those go to the model.
+        """
+        if not func.__doc__:
+            return None
+        try:
+            signature = inspect.signature(func)
+            hints = typing.get_type_hints(func)
+        except (NameError, TypeError, ValueError):
+            return None
+        description, param_docs = _parse_docstring(func.__doc__)
+
+        properties, required = {}, []
+        for name, param in signature.parameters.items():
+            if name not in hints or param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                return None
+            annotation = hints[name]
+            args = typing.get_args(annotation)
+            if typing.get_origin(annotation) in _UNION_ORIGINS and type(None) in args:
+                # Optional[T] is described as T; only a default makes the parameter optional
+                args = [arg for arg in args if arg is not type(None)]
+                if len(args) != 1:
+                    return None
+                annotation = args[0]
+            prop = _json_type(annotation)
+            if prop is None:
+                return None
+            if param_docs.get(name):
+                prop["description"] = param_docs[name]
+            properties[name] = prop
+            if param.default is param.empty:
+                required.append(name)
+
+        return {
+            "type": "function",
+            "function": {
+                "name": func.__name__,
+                "description": description,
+                "strict": False,
+                "parameters": {
+                    "type": "object",
+                    "properties": properties,
+                    "required": required,
+                    "additionalProperties": False
+                }
+            }
+        }
 
     def convert_functions_to_string(self, functions: List[Callable]) -> List[str]:
         """
@@ -63,473 +509,304 @@ class ToolConverter:
             function_strings.append(self._get_function_source(func))
         return function_strings
     
-    def create_function_schema(self, function_string: str) -> Dict:
+    def create_function_schema(self, function_string: str, cache: bool = True) -> Dict:
         """
         Generate a JSON schema for a function by sending its source code to the OpenAI model.
 
         The model receives a system and user message instructing it to produce a JSON schema
         that includes a 'type': 'function' at the root, a 'function' block with 'name',
-        'description', 'strict': false, and 'parameters' detailing each parameter.
+        'description', 'strict': false, and 'parameters' detailing each parameter. An answer
+        without that shape is sent back once, together with what is wrong with it.
 
         Args:
             function_string (str): The source code of a single function.
+            cache (bool): Set to False to skip the cache lookup and regenerate the schema; the new
+                result still replaces the cached one.
 
         Returns:
             Dict: The JSON schema for the given function.
+                  Results are cached by function source (see `cache_path`), so an unchanged
+                  function is only sent to the model once.
         """
-        response = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "(\"\"\"### JSON Schema Generator\n"
-                               "    Your primary role is to convert provided function details into JSON schemas. The schemas should be clear, structured, and follow a specific format.\n\n"
-                               "    ### Schema Structure:\n"
-                               "    Each schema must start with a `\"type\": \"function\"` key. The function details should be nested under a `\"function\"` key.\n\n"
-                               "    ### Schema Format:\n"
-                               "    - **name**: The function's name.\n"
-                               "    - **description**: A brief description of what the function does.\n"
-                               "    - **strict**: A required key set to `false`.\n"
-                               "    - **parameters**: An object detailing the parameters the function accepts.\n"
-                               "      - **type**: Always `\"object\"`.\n"
-                               "      - **properties**: An object where each key is a parameter name and its value is an object with `\"type\"` and `\"description\"`.\n"
-                               "      - **required**: An array of parameter names that are required.\n"
-                               "      - **additionalProperties**: Must be set to `false`.\n\n"
-                               "    ### Examples:\n"
-                               "    Example 1:\n"
-                               "    ```json\n"
-                               "    {\n"
-                               "      \"type\": \"function\",\n"
-                               "      \"function\": {\n"
-                               "        \"name\": \"bing_search\",\n"
-                               "        \"description\": \"Searches Bing with a provided query and returns relevant web search results.\",\n"
-                               "        \"strict\": false,\n"
-                               "        \"parameters\": {\n"
-                               "          \"type\": \"object\",\n"
-                               "          \"properties\": {\n"
-                               "            \"query\": {\n"
-                               "              \"type\": \"string\",\n"
-                               "              \"description\": \"The search query for Bing Search.\"\n"
-                               "            }\n"
-                               "          },\n"
-                               "          \"required\": [\"query\"],\n"
-                               "          \"additionalProperties\": false\n"
-                               "        }\n"
-                               "      }\n"
-                               "    }\n"
-                               "    ```\n\n"
-                               "    Example 2:\n"
-                               "    ```json\n"
-                               "        {\n"
-                               "      \"type\": \"function\",\n"
-                               "      \"function\": {\n"
-                               "        \"name\": \"manage_notes\",\n"
-                               "        \"description\": \"Manage notes in a text file for later use.\",\n"
-                               "        \"strict\": false,\n"
-                               "        \"parameters\": {\n"
-                               "          \"type\": \"object\",\n"
-                               "          \"properties\": {\n"
-                               "            \"action\": {\n"
-                               "              \"type\": \"string\",\n"
-                               "              \"description\": \"The action to perform on the notes file.\",\n"
-                               "              \"enum\": [\"create\", \"update\", \"retrieve\", \"clear\"]\n"
-                               "            },\n"
-                               "            \"content\": {\n"
-                               "              \"type\": \"string\",\n"
-                               "              \"description\": \"The content for 'create' and 'update' actions.\"\n"
-                               "            }\n"
-                               "          },\n"
-                               "          \"required\": [\"action\"],\n"
-                               "          \"additionalProperties\": false\n"
-                               "        }\n"
-                               "      }\n"
-                               "    }\n"
-                               "    ```\n\n"
-                               "    ### Template:\n"
-                               "    ```json\n"
-                               "        {\n"
-                               "      \"type\": \"function\",\n"
-                               "      \"function\": {\n"
-                               "        \"name\": \"new_tool\",\n"
-                               "        \"description\": \"This is a template that you can start from to build your tool\",\n"
-                               "        \"strict\": false,\n"
-                               "        \"parameters\": {\n"
-                               "          \"type\": \"object\",\n"
-                               "          \"properties\": {\n"
-                               "            \"array_property_name\": {\n"
-                               "              \"description\": \"A property that returns an array of items (can be any type mentioned below, including an object)\",\n"
-                               "              \"items\": {\n"
-                               "                \"type\": \"string\"\n"
-                               "              },\n"
-                               "              \"type\": \"array\"\n"
-                               "            },\n"
-                               "            \"boolean_property_name\": {\n"
-                               "              \"description\": \"A property that returns a boolean\",\n"
-                               "              \"type\": \"boolean\"\n"
-                               "            },\n"
-                               "            \"enum_property_name\": {\n"
-                               "              \"description\": \"A property that returns a value from a list of enums (can be any type)\",\n"
-                               "              \"enum\": [\n"
-                               "                \"option 1\",\n"
-                               "                \"option 2\",\n"
-                               "                \"option 3\"\n"
-                               "              ],\n"
-                               "              \"type\": \"string\"\n"
-                               "            },\n"
-                               "            \"number_property_name\": {\n"
-                               "              \"description\": \"A property that returns a number\",\n"
-                               "              \"type\": \"number\"\n"
-                               "            },\n"
-                               "            \"object_property_name\": {\n"
-                               "              \"description\": \"A property that returns an object\",\n"
-                               "              \"properties\": {\n"
-                               "                \"foo\": {\n"
-                               "                  \"description\": \"A property on the object called 'foo' that returns a string\",\n"
-                               "                  \"type\": \"string\"\n"
-                               "                },\n"
-                               "                \"bar\": {\n"
-                               "                  \"description\": \"A property on the object called 'bar' that returns a number\",\n"
-                               "                  \"type\": \"number\"\n"
-                               "                }\n"
-                               "              },\n"
-                               "              \"additionalProperties\": false\n"
-                               "            },\n"
-                               "            \"string_property_name\": {\n"
-                               "              \"description\": \"A property that returns a string\",\n"
-                               "              \"type\": \"string\"\n"
-                               "            }\n"
-                               "          },\n"
-                               "          \"required\": [\n"
-                               "            \"array_property_name\",\n"
-                               "            \"number_property_name\"\n"
-                               "          ],\n"
-                               "          \"additionalProperties\": false\n"
-                               "        }\n"
-                               "      }\n"
-                               "    }\n"
-                               "    ```\n\n"
-                               "    ### Additional Complex Examples:\n"
-                               "    Example 3 (Nested Objects):\n"
-                               "    ```json\n"
-                               "    {\n"
-                               "      \"type\": \"function\",\n"
-                               "      \"function\": {\n"
-                               "        \"name\": \"create_user_profile\",\n"
-                               "        \"description\": \"Creates a user profile with nested address information.\",\n"
-                               "        \"strict\": false,\n"
-                               "        \"parameters\": {\n"
-                               "          \"type\": \"object\",\n"
-                               "          \"properties\": {\n"
-                               "            \"username\": {\n"
-                               "              \"type\": \"string\",\n"
-                               "              \"description\": \"The desired username.\"\n"
-                               "            },\n"
-                               "            \"age\": {\n"
-                               "              \"type\": \"number\",\n"
-                               "              \"description\": \"The user's age in years.\"\n"
-                               "            },\n"
-                               "            \"address\": {\n"
-                               "              \"type\": \"object\",\n"
-                               "              \"properties\": {\n"
-                               "                \"street\": {\n"
-                               "                  \"type\": \"string\",\n"
-                               "                  \"description\": \"Street name of the user's address.\"\n"
-                               "                },\n"
-                               "                \"city\": {\n"
-                               "                  \"type\": \"string\",\n"
-                               "                  \"description\": \"City name where the user resides.\"\n"
-                               "                },\n"
-                               "                \"zipcode\": {\n"
-                               "                  \"type\": \"string\",\n"
-                               "                  \"description\": \"Postal code of the address.\"\n"
-                               "                }\n"
-                               "              },\n"
-                               "              \"required\": [\"street\", \"city\"],\n"
-                               "              \"additionalProperties\": false\n"
-                               "            }\n"
-                               "          },\n"
-                               "          \"required\": [\"username\", \"address\"],\n"
-                               "          \"additionalProperties\": false\n"
-                               "        }\n"
-                               "      }\n"
-                               "    }\n"
-                               "    ```\n\n"
-                               "    Example 4 (Arrays of Objects):\n"
-                               "    ```json\n"
-                               "    {\n"
-                               "      \"type\": \"function\",\n"
-                               "      \"function\": {\n"
-                               "        \"name\": \"batch_process_items\",\n"
-                               "        \"description\": \"Processes a batch of items, each with its own attributes.\",\n"
-                               "        \"strict\": false,\n"
-                               "        \"parameters\": {\n"
-                               "          \"type\": \"object\",\n"
-                               "          \"properties\": {\n"
-                               "            \"items\": {\n"
-                               "              \"type\": \"array\",\n"
-                               "              \"description\": \"A list of items to process.\",\n"
-                               "              \"items\": {\n"
-                               "                \"type\": \"object\",\n"
-                               "                \"properties\": {\n"
-                               "                  \"id\": {\n"
-                               "                    \"type\": \"number\",\n"
-                               "                    \"description\": \"Unique identifier for the item.\"\n"
-                               "                  },\n"
-                               "                  \"value\": {\n"
-                               "                    \"type\": \"string\",\n"
-                               "                    \"description\": \"Value associated with the item.\"\n"
-                               "                  }\n"
-                               "                },\n"
-                               "                \"required\": [\"id\", \"value\"],\n"
-                               "                \"additionalProperties\": false\n"
-                               "              }\n"
-                               "            }\n"
-                               "          },\n"
-                               "          \"required\": [\"items\"],\n"
-                               "          \"additionalProperties\": false\n"
-                               "        }\n"
-                               "      }\n"
-                               "    }\n"
-                               "    ```\n\n"
-                               "    Example 5 (Enum Types and Arrays):\n"
-                               "    ```json\n"
-                               "    {\n"
-                               "      \"type\": \"function\",\n"
-                               "      \"function\": {\n"
-                               "        \"name\": \"filter_records\",\n"
-                               "        \"description\": \"Filters records based on a set of criteria.\",\n"
-                               "        \"strict\": false,\n"
-                               "        \"parameters\": {\n"
-                               "          \"type\": \"object\",\n"
-                               "          \"properties\": {\n"
-                               "            \"status\": {\n"
-                               "              \"type\": \"string\",\n"
-                               "              \"description\": \"Status to filter by.\",\n"
-                               "              \"enum\": [\"active\", \"inactive\", \"pending\"]\n"
-                               "            },\n"
-                               "            \"tags\": {\n"
-                               "              \"type\": \"array\",\n"
-                               "              \"description\": \"List of tags to match.\",\n"
-                               "              \"items\": {\n"
-                               "                \"type\": \"string\"\n"
-                               "              }\n"
-                               "            }\n"
-                               "          },\n"
-                               "          \"required\": [\"status\"],\n"
-                               "          \"additionalProperties\": false\n"
-                               "        }\n"
-                               "      }\n"
-                               "    }\n"
-                               "    ```\n\n"
-                               "    Example 6 (Complex Nested Structures):\n"
-                               "    ```json\n"
-                               "    {\n"
-                               "      \"type\": \"function\",\n"
-                               "      \"function\": {\n"
-                               "        \"name\": \"analyze_data\",\n"
-                               "        \"description\": \"Analyzes complex data with nested structures and multiple enum fields.\",\n"
-                               "        \"strict\": false,\n"
-                               "        \"parameters\": {\n"
-                               "          \"type\": \"object\",\n"
-                               "          \"properties\": {\n"
-                               "            \"metadata\": {\n"
-                               "              \"type\": \"object\",\n"
-                               "              \"properties\": {\n"
-                               "                \"source\": {\n"
-                               "                  \"type\": \"string\",\n"
-                               "                  \"description\": \"The data source identifier.\"\n"
-                               "                },\n"
-                               "                \"timestamp\": {\n"
-                               "                  \"type\": \"string\",\n"
-                               "                  \"description\": \"ISO 8601 timestamp of when the data was collected.\"\n"
-                               "                }\n"
-                               "              },\n"
-                               "              \"required\": [\"source\"],\n"
-                               "              \"additionalProperties\": false\n"
-                               "            },\n"
-                               "            \"data_points\": {\n"
-                               "              \"type\": \"array\",\n"
-                               "              \"description\": \"An array of data points to be analyzed.\",\n"
-                               "              \"items\": {\n"
-                               "                \"type\": \"object\",\n"
-                               "                \"properties\": {\n"
-                               "                  \"value\": {\n"
-                               "                    \"type\": \"number\",\n"
-                               "                    \"description\": \"Numeric value of the data point.\"\n"
-                               "                  },\n"
-                               "                  \"type\": {\n"
-                               "                    \"type\": \"string\",\n"
-                               "                    \"description\": \"Type/category of the data point.\",\n"
-                               "                    \"enum\": [\"metric\", \"dimension\", \"event\"]\n"
-                               "                  },\n"
-                               "                  \"attributes\": {\n"
-                               "                    \"type\": \"object\",\n"
-                               "                    \"properties\": {\n"
-                               "                      \"quality\": {\n"
-                               "                        \"type\": \"string\",\n"
-                               "                        \"enum\": [\"high\", \"medium\", \"low\"],\n"
-                               "                        \"description\": \"Quality level of the data point.\"\n"
-                               "                      },\n"
-                               "                      \"annotations\": {\n"
-                               "                        \"type\": \"array\",\n"
-                               "                        \"description\": \"List of annotations associated with the data point.\",\n"
-                               "                        \"items\": {\n"
-                               "                          \"type\": \"string\"\n"
-                               "                        }\n"
-                               "                      }\n"
-                               "                    },\n"
-                               "                    \"additionalProperties\": false\n"
-                               "                  }\n"
-                               "                },\n"
-                               "                \"required\": [\"value\", \"type\"],\n"
-                               "                \"additionalProperties\": false\n"
-                               "              }\n"
-                               "            }\n"
-                               "          },\n"
-                               "          \"required\": [\"metadata\", \"data_points\"],\n"
-                               "          \"additionalProperties\": false\n"
-                               "        }\n"
-                               "      }\n"
-                               "    }\n"
-                               "    ```\n\n"
-                               "    Example 7 (Multiple Required Enums and Nested Arrays):\n"
-                               "    ```json\n"
-                               "    {\n"
-                               "      \"type\": \"function\",\n"
-                               "      \"function\": {\n"
-                               "        \"name\": \"configure_system\",\n"
-                               "        \"description\": \"Configures a system with a set of parameters and nested operations.\",\n"
-                               "        \"strict\": false,\n"
-                               "        \"parameters\": {\n"
-                               "          \"type\": \"object\",\n"
-                               "          \"properties\": {\n"
-                               "            \"operation_mode\": {\n"
-                               "              \"type\": \"string\",\n"
-                               "              \"description\": \"The mode in which the system should operate.\",\n"
-                               "              \"enum\": [\"automatic\", \"manual\"]\n"
-                               "            },\n"
-                               "            \"tasks\": {\n"
-                               "              \"type\": \"array\",\n"
-                               "              \"description\": \"A list of tasks to be scheduled.\",\n"
-                               "              \"items\": {\n"
-                               "                \"type\": \"object\",\n"
-                               "                \"properties\": {\n"
-                               "                  \"task_name\": {\n"
-                               "                    \"type\": \"string\",\n"
-                               "                    \"description\": \"The name of the task.\"\n"
-                               "                  },\n"
-                               "                  \"frequency\": {\n"
-                               "                    \"type\": \"string\",\n"
-                               "                    \"description\": \"How often the task should run.\",\n"
-                               "                    \"enum\": [\"daily\", \"weekly\", \"monthly\"]\n"
-                               "                  },\n"
-                               "                  \"parameters\": {\n"
-                               "                    \"type\": \"object\",\n"
-                               "                    \"properties\": {\n"
-                               "                      \"threshold\": {\n"
-                               "                        \"type\": \"number\",\n"
-                               "                        \"description\": \"A numerical threshold for the task.\"\n"
-                               "                      },\n"
-                               "                      \"flags\": {\n"
-                               "                        \"type\": \"array\",\n"
-                               "                        \"description\": \"List of optional flags.\",\n"
-                               "                        \"items\": {\n"
-                               "                          \"type\": \"string\"\n"
-                               "                        }\n"
-                               "                      }\n"
-                               "                    },\n"
-                               "                    \"additionalProperties\": false\n"
-                               "                  }\n"
-                               "                },\n"
-                               "                \"required\": [\"task_name\", \"frequency\"],\n"
-                               "                \"additionalProperties\": false\n"
-                               "              }\n"
-                               "            }\n"
-                               "          },\n"
-                               "          \"required\": [\"operation_mode\", \"tasks\"],\n"
-                               "          \"additionalProperties\": false\n"
-                               "        }\n"
-                               "      }\n"
-                               "    }\n"
-                               "    ```\n\n"
-                               "    ### Requirements:\n\n"
-                               "    1.\tUse exact naming conventions and parameter names from the provided function.\n"
-                               "    2.\tEnsure the schema is a valid JSON object.\n"
-                               "    3.\tMaintain the specified format and structure in your response.\n\n"
-                               "    The aim is to provide users with a JSON schema that precisely matches the functionality of the given function, aiding in their software development projects.\n\n"
-                               "    You should concentrate on defining each function’s name, description, parameters, and required fields in a JSON format, adhering to the structure shown in these examples. The aim is to provide users with a JSON schema that precisely matches the functionality of the given function. You’re not tasked with creating Python schemas but rather converting the function details into the correct JSON schema format.\n"
-                               "    Your primary role is to convert provided function details into JSON schemas. The schemas should be clear, structured, and follow a specific format.\n\"\"\")"
-                },
-                {
-                    "role": "user",
-                    "content": f"Generate a valid schema for the following: {function_string}"
-                }
-            ],
-            response_format={
-                "type": "json_object"
-            },
-            temperature=0.5,
-            max_tokens=4096,
-            top_p=1,
-            frequency_penalty=0,
-            presence_penalty=0
-        )
+        key = self._function_cache_key(function_string)
+        cached = self._cache_get(key) if cache else None
+        if cached is not None:
+            return cached
+
+        request = self._schema_request(function_string)
+        schema = self._request(request)
+        error = _schema_error(schema)
+        if error:
+            # One repair round with the problem spelled out
+            schema = self._request(self._repair_request(request, schema, error))
+        return self._store_schema(key, schema)
+
+    async def acreate_function_schema(self, function_string: str, client: "AsyncOpenAI", cache: bool = True) -> str:
+        """Async version of `create_function_schema`, sharing its cache."""
+        key = self._function_cache_key(function_string)
+        cached = self._cache_get(key) if cache else None
+        if cached is not None:
+            return cached
+
+        request = self._schema_request(function_string)
+        schema = await self._arequest(client, request)
+        error = _schema_error(schema)
+        if error:
+            schema = await self._arequest(client, self._repair_request(request, schema, error))
+        return self._store_schema(key, schema)
+
+    def _request(self, request: Dict) -> str:
+        # Rate limits and server errors are retried with backoff (1s doubling, capped at 30s)
+        response = retry_call(self.client.chat.completions.create, attempts=3, initial_delay=1.0,
+                              max_delay=30.0, **request)
         return response.choices[0].message.content
-    
-    
-    def create_function_schemas(self, function_strings: List[str], max_workers: int = None) -> str:
+
+    async def _arequest(self, client: "AsyncOpenAI", request: Dict) -> str:
+        limiter = self.rate_limiter
+        # The system prompt is about 2k tokens; the estimate is corrected from the reported usage
+        est_tokens = sum(len(message["content"]) for message in request["messages"][1:]) // 4 + 2048
+        if limiter:
+            await limiter.acquire(est_tokens)
+        # Rate limits and server errors are retried with backoff (1s doubling, capped at 30s)
+        response = await aretry_call(client.chat.completions.create, attempts=3, initial_delay=1.0,
+                                     max_delay=30.0, **request)
+        if limiter and getattr(response, "usage", None):
+            limiter.record(response.usage.total_tokens, est_tokens)
+        return response.choices[0].message.content
+
+    def _repair_request(self, request: Dict, schema: str, error: str) -> Dict:
+        """`request` continued with the rejected answer and a note on what was wrong with it."""
+        return dict(request, messages=request["messages"] + [
+            {"role": "assistant", "content": schema},
+            {"role": "user", "content": f"Previous output failed validation: {error}. Return valid JSON only."},
+        ])
+
+    def _store_schema(self, key: str, schema: str) -> str:
+        # Only valid schemas are kept; anything else is retried on the next call
+        if _schema_error(schema) is None:
+            self._cache_put(key, schema)
+        return schema
+
+    def _schema_request(self, function_string: str) -> Dict:
+        """Keyword arguments of the chat completion that writes the schema of one function."""
+        return dict(
+            _SAMPLING_KWARGS,
+            model=self.model,
+            messages=[_SYSTEM_MESSAGE, {"role": "user", "content": f"Generate a valid schema for the following: {function_string}"}],
+            response_format=_RESPONSE_FORMAT,
+            temperature=self.schema_temperature,
+            max_tokens=self.schema_max_tokens
+        )
+
+    def _function_cache_key(self, function_string: str) -> str:
+        source = _canonical_source(function_string)
+        return hashlib.blake2b(f"{self.model}\0{_SYSTEM_PROMPT_DIGEST}\0{source}".encode("utf-8"),
+                               digest_size=16).hexdigest()
+
+    def _schema_db(self) -> sqlite3.Connection:
+        """Open the per-function cache database on first use. Call with `_cache_lock` held."""
+        if self._db is None:
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.cache_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS schema_cache(key TEXT PRIMARY KEY, schema TEXT)")
+        return self._db
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with self._cache_lock:
+            schema = self._cache.get(key)
+            if schema is None and self.cache_path:
+                row = self._schema_db().execute("SELECT schema FROM schema_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    schema = self._cache[key] = row[0]
+            return schema
+
+    def _cache_put(self, key: str, schema: str):
+        with self._cache_lock:
+            self._cache[key] = schema
+            if self.cache_path:
+                with self._schema_db() as db:
+                    db.execute("INSERT OR REPLACE INTO schema_cache(key, schema) VALUES (?, ?)", (key, schema))
+
+    def create_function_schemas(self, function_strings: List[str], max_workers: int = None,
+                                batch_size: int = 1) -> str:
         """
         Creates JSON schemas for multiple functions in parallel, then merges them into a single JSON string.
 
+        The requests run concurrently on the async OpenAI client when that is possible: an async
+        client was given, or the default client is in use, and no event loop is running in this
+        thread. Otherwise they are spread over a thread pool using the sync client.
+
         Args:
             function_strings (List[str]): Source code strings for the functions.
-            max_workers (int, optional): Number of threads for parallel execution. Defaults to 10.
+            max_workers (int, optional): Most requests in flight at once. Defaults to 64 on the
+                async client and 10 threads otherwise.
+            batch_size (int, optional): Functions per request. Above 1, that many uncached functions
+                share one prompt, which saves per-request overhead for many small functions.
+                Batched requests use the sync client on a thread pool. Defaults to 1.
 
         Returns:
             str: A JSON-formatted string containing a list of all generated schemas.
         """
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            schema_futures = executor.map(self.create_function_schema, function_strings)
-            
-            schemas = []
-            for schema in schema_futures:
-                schema_dict = json.loads(schema)
-                schemas.append(schema_dict)
-            
-            combined_schema = json.dumps(schemas, indent=2)
-            return combined_schema
-
-    def convert_openai_to_anthropic(self, openai_schema):
+        return self._dumps(self.create_function_schemas_parsed(function_strings, max_workers, batch_size))
+
+    def create_function_schemas_parsed(self, function_strings: List[str], max_workers: int = None,
+                                       batch_size: int = 1) -> List[Dict]:
+        """
+        Same as `create_function_schemas`, but returns the list of parsed schemas instead of
+        serializing it, for callers that would only parse the string again.
+        """
+        if batch_size > 1:
+            return self._create_function_schemas_batched(function_strings, batch_size, max_workers)
+
+        try:
+            asyncio.get_running_loop()
+            in_loop = True
+        except RuntimeError:
+            in_loop = False
+        # A custom sync client may carry settings (base URL, keys) a fresh async client would lack
+        if not in_loop and (self.async_client is not None or self.client is _DEFAULT_CLIENT):
+            return asyncio.run(self.acreate_function_schemas(function_strings, max_workers or 64))
+        with ThreadPoolExecutor(max_workers=max_workers or 10) as executor:
+            return [loads(schema) for schema in executor.map(self.create_function_schema, function_strings)]
+
+    def _create_function_schemas_batched(self, function_strings: List[str], batch_size: int = 8,
+                                         max_workers: int = None) -> List[Dict]:
+        """Parsed schemas of `function_strings`, with the uncached ones requested `batch_size` at a time."""
+        keys = [self._function_cache_key(function_string) for function_string in function_strings]
+        results = [self._cache_get(key) for key in keys]
+        missing = [idx for idx, schema in enumerate(results) if schema is None]
+        batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+
+        def run(batch: List[int]) -> tuple:
+            return batch, self._request_schema_batch([function_strings[idx] for idx in batch])
+
+        with ThreadPoolExecutor(max_workers=max_workers or 10) as executor:
+            for batch, schemas in executor.map(run, batches):
+                for idx, schema in zip(batch, schemas):
+                    results[idx] = self._store_schema(keys[idx], schema)
+        return [loads(schema) for schema in results]
+
+    def _request_schema_batch(self, function_strings: List[str]) -> List[str]:
+        """
+        Raw schema answers for several functions from a single request. If the answer does not hold
+        one valid schema per function, the affected functions are requested one by one instead.
+        """
+        if len(function_strings) == 1:
+            return [self.create_function_schema(function_strings[0])]
+
+        numbered = "\n\n".join(f"Function {idx}:\n{function_string}"
+                                for idx, function_string in enumerate(function_strings, 1))
+        request = self._schema_request(numbered)
+        request["messages"] = [_SYSTEM_MESSAGE, {
+            "role": "user",
+            "content": f"Generate a valid schema for each of the following {len(function_strings)} functions. "
+                       f'Answer with a JSON object {{"schemas": [...]}} holding one schema per function, in order.\n\n{numbered}'
+        }]
+        request["response_format"] = {"type": "json_object"}
+        # gpt-4o and gpt-4o-mini return at most 16k output tokens
+        request["max_tokens"] = min(16384, request["max_tokens"] * len(function_strings))
+
+        content = self._request(request)
+        try:
+            schemas = loads(content)["schemas"]
+        except (ValueError, KeyError, TypeError):
+            schemas = None
+        if not isinstance(schemas, list) or len(schemas) != len(function_strings):
+            return [self.create_function_schema(function_string) for function_string in function_strings]
+
+        answers = []
+        for function_string, schema in zip(function_strings, schemas):
+            answers.append(dumps(schema) if _parsed_schema_error(schema) is None
+                           else self.create_function_schema(function_string))
+        return answers
+
+    async def acreate_function_schemas(self, function_strings: List[str], max_workers: int = 10) -> List[Dict]:
+        """
+        Creates the schemas of several functions concurrently with the async OpenAI client.
+
+        Args:
+            function_strings (List[str]): Source code strings for the functions.
+            max_workers (int, optional): Most requests in flight at once. Defaults to 10.
+
+        Returns:
+            List[Dict]: The parsed schemas, in the order of function_strings. If any request fails,
+                        the first error is raised once all of them are done.
+        """
+        semaphore = asyncio.Semaphore(max_workers)
+        # A client made here is tied to this event loop, so it is closed again before returning
+        if self.async_client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI()
+        else:
+            client = self.async_client
+
+        async def create(function_string: str) -> Dict:
+            async with semaphore:
+                return loads(await self.acreate_function_schema(function_string, client))
+
+        try:
+            # Let every request finish before reporting a failure: the successful schemas are
+            # cached by then, so a rerun only pays for the functions that failed
+            results = await asyncio.gather(*(create(function_string) for function_string in function_strings),
+                                           return_exceptions=True)
+        finally:
+            if client is not self.async_client:
+                await client.close()
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def convert_all(self, functions: List[Callable], max_workers: int = 10) -> List[Dict]:
+        """
+        Generate the OpenAI-style schema of every function, with all model calls in flight at once.
+        Must not be called from a running event loop; await `acreate_function_schemas` there instead.
+
+        Args:
+            functions (List[Callable]): The Python functions to convert.
+            max_workers (int, optional): Most requests in flight at once. Defaults to 10.
+
+        Returns:
+            List[Dict]: One schema per function, in order.
+        """
+        schemas = [self._schema_from_introspection(func) for func in functions]
+        missing = [idx for idx, schema in enumerate(schemas) if schema is None]
+        if missing:
+            function_strings = self.convert_functions_to_string([functions[idx] for idx in missing])
+            generated = asyncio.run(self.acreate_function_schemas(function_strings, max_workers))
+            for idx, schema in zip(missing, generated):
+                schemas[idx] = schema
+        return schemas
+
+    def _dumps(self, obj) -> str:
+        """Compact JSON, or indented by indent_size spaces when that is set."""
+        return dumps(obj, indent=self.indent_size)
+
+    def convert_openai_to_anthropic(self, openai_schema, deep: bool = False):
         """
         Convert the OpenAI schema format into Anthropic format.
 
         Anthropic format requires a 'name', 'description', and 'input_schema' key, where 'input_schema'
         details parameters similarly to OpenAI but without the 'type': 'function' wrapper.
 
+        The 'properties' and 'required' values are shared with `openai_schema`, not copied.
+        Converting a list of the same tool objects again returns the same list, so tool
+        definitions must not be changed in place once converted.
+
         Args:
             openai_schema (list): List of tool definitions in OpenAI format.
+            deep (bool): Return a fully independent copy instead, for callers that mutate the result.
 
         Returns:
             list: Tool definitions reformatted for Anthropic.
         """
-        anthropic_schema = []
-        for tool in openai_schema:
-            function_details = tool.get("function", tool)
-            
-            anthropic_tool = {
-                "name": function_details["name"],
-                "description": function_details["description"],
-                "input_schema": {
-                    "type": "object",
-                    "properties": function_details["parameters"]["properties"],
-                    "required": function_details["parameters"].get("required", [])
-                }
-            }
-            anthropic_schema.append(anthropic_tool)
-        
-        return anthropic_schema
+        converted = self._convert_all(openai_schema)[0]
+        return _json_copy(converted) if deep else converted
     
-    def convert_openai_to_gemini(self, openai_schema):
+    def convert_openai_to_gemini(self, openai_schema, deep: bool = False):
         """
         Convert the OpenAI schema format into Gemini format.
 
@@ -537,37 +814,47 @@ class ToolConverter:
         It retains 'name', 'description', and a 'parameters' object structured as an object with
         'properties' and 'required'.
 
+        The 'properties' and 'required' values are shared with `openai_schema`, not copied.
+        Converting a list of the same tool objects again returns the same list, so tool
+        definitions must not be changed in place once converted.
+
         Args:
             openai_schema (list): List of tool definitions in OpenAI format.
+            deep (bool): Return a fully independent copy instead, for callers that mutate the result.
 
         Returns:
             list: Tool definitions suitable for Gemini.
         """
-        gemini_schema = []
-        
+        converted = self._convert_all(openai_schema)[1]
+        return _json_copy(converted) if deep else converted
+
+    def _convert_all(self, openai_schema) -> tuple:
+        """
+        Anthropic and Gemini versions of `openai_schema`, built in a single pass over the tools.
+        Agents often rebuild the tool list from the same tool dicts every turn, so results are
+        memoized by the identity of those dicts. Each entry keeps the dicts alive, so their ids
+        cannot be reused while the entry exists.
+        """
+        tools = tuple(openai_schema)
+        key = tuple(map(id, tools))
+        memoized = self._conversion_memo.get(key)
+        if memoized is not None:
+            return memoized[1]
+
+        anthropic_schema, gemini_schema = [], []
         for tool in openai_schema:
             function_details = tool.get("function", tool)
-            
-            parameters = {
-                "type": "object",
-                "properties": function_details["parameters"]["properties"],
-                "required": function_details["parameters"].get("required", [])
-            }
-            
-            gemini_tool = {
-                "type": "function",
-                "function": {
-                    "name": function_details["name"],
-                    "description": function_details["description"],
-                    "parameters": parameters
-                }
-            }
-            gemini_schema.append(gemini_tool)
-        
-        return gemini_schema
+            anthropic_schema.append(_anthropic_tool(function_details))
+            gemini_schema.append(_gemini_tool(function_details))
+        if len(self._conversion_memo) >= _CONVERSION_MEMO_SIZE:
+            # Drop the oldest entry; dicts keep insertion order
+            del self._conversion_memo[next(iter(self._conversion_memo))]
+        converted = (anthropic_schema, gemini_schema)
+        self._conversion_memo[key] = (tools, converted)
+        return converted
     
 
-    def generate_schemas(self, functions: List[Callable]) -> dict:
+    def generate_schemas(self, functions: List[Callable]) -> typing.Mapping[str, List[Dict]]:
         """
         Generate schemas for OpenAI, Anthropic, Gemini, and Groq by:
         1. Converting functions to source strings.
@@ -578,23 +865,67 @@ class ToolConverter:
             functions (List[Callable]): The Python functions to convert.
 
         Returns:
-            dict: A dictionary with 'openai', 'anthropic', 'gemini', and 'groq' keys, each containing their respective schemas.
+            Mapping: A read-only mapping with 'openai', 'anthropic', 'gemini', and 'groq' keys, each containing their respective schemas.
+                     Repeated calls with the same functions return the same (memoized) mapping. Groq takes the
+                     OpenAI format, so 'groq' is the same list object as 'openai'; treat the schemas as read-only.
         """
+        memo_key = tuple(functions)
+        memoized = self._schemas_memo.get(memo_key)
+        if memoized is not None:
+            return memoized
+
         function_strings = self.convert_functions_to_string(functions)
+
+        cache_path = self._schema_cache_path(function_strings)
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                schemas = loads(f.read())
+            schemas["groq"] = schemas["openai"]
+            schemas = self._schemas_memo[memo_key] = types.MappingProxyType(schemas)
+            return schemas
+
+        # Functions that introspection can describe skip the model entirely
+        openai_parsed = [self._schema_from_introspection(func) for func in functions]
+        missing = [idx for idx, schema in enumerate(openai_parsed) if schema is None]
+        if missing:
+            generated = self.create_function_schemas_parsed([function_strings[idx] for idx in missing])
+            for idx, schema in zip(missing, generated):
+                openai_parsed[idx] = schema
         
-        openai_schema = self.create_function_schemas(function_strings)
-        openai_parsed = json.loads(openai_schema)
-        
-        anthropic_schema = self.convert_openai_to_anthropic(openai_parsed)
-        gemini_schema = self.convert_openai_to_gemini(openai_parsed)
-        groq_schema = openai_parsed
+        anthropic_schema, gemini_schema = self._convert_all(openai_parsed)
 
-        return {
+        # Groq takes the OpenAI format as is, so both keys share one list rather than a copy
+        schemas = {
             "openai": openai_parsed,
             "anthropic": anthropic_schema,
             "gemini": gemini_schema,
-            "groq": groq_schema
+            "groq": openai_parsed
         }
+        # A schema that is still malformed after its repair round is returned, but not persisted
+        if cache_path and all(_parsed_schema_error(schema) is None for schema in openai_parsed):
+            self._write_schema_cache(cache_path, schemas)
+        schemas = self._schemas_memo[memo_key] = types.MappingProxyType(schemas)
+        return schemas
+
+    def _schema_cache_path(self, function_strings: List[str]) -> Optional[str]:
+        """
+        Path of the on-disk cache entry for a set of function sources, or None if caching is disabled.
+        Keying on the full source means any edit to a signature, body or docstring picks a new entry,
+        and so does a different model, a change to the instructions or a new `_SCHEMA_FORMAT_VERSION`.
+        """
+        if not self.cache_dir:
+            return None
+        parts = [_SCHEMA_FORMAT_VERSION, self.model, _SYSTEM_PROMPT_DIGEST, *function_strings]
+        key = hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, f"schemas_{key}.json")
+
+    def _write_schema_cache(self, cache_path: str, schemas: dict):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Write to a temporary file first so an interrupted run never leaves a truncated entry
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(dumps(schemas))
+        os.replace(tmp_path, cache_path)
 
 # Example usage
 def print_text(text):